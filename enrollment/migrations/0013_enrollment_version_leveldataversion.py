@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_years', '0004_alter_academicyear_name'),
+        ('enrollment', '0012_alter_enrollment_unique_together'),
+        ('levels', '0012_alter_level_options_level_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='LevelDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academic_years.academicyear')),
+                ('level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='levels.level')),
+            ],
+            options={
+                'unique_together': {('level', 'academic_year')},
+            },
+        ),
+    ]
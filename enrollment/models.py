@@ -13,9 +13,23 @@ class Enrollment(models.Model):
     academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE)
     date_enrolled = models.DateField()
     enrollment_status = models.CharField(max_length=10, choices=ENROLLMENT_STATUS_CHOICES, default='ENROLLED')
+    # Bumped on every change to this enrollment's grades, student or status (see enrollment.versioning)
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('student', 'level', 'academic_year')
 
     def __str__(self):
-        return f"{self.student} - {self.level} - {self.academic_year}"
\ No newline at end of file
+        return f"{self.student} - {self.level} - {self.academic_year}"
+
+class LevelDataVersion(models.Model):
+    """Change counter for everything shown on a level's report cards in one academic year."""
+    level = models.ForeignKey(Level, on_delete=models.CASCADE)
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE)
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('level', 'academic_year')
+
+    def __str__(self):
+        return f"{self.level} - {self.academic_year} - v{self.version}"
@@ -0,0 +1,68 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from academic_years.models import AcademicYear
+from grades.models import Grade
+from levels.models import Level
+from pass_and_failed.backfill import backfill_missing_statuses
+from pass_and_failed.models import PassFailedStatus
+from students.models import Student
+from subjects.models import Subject
+from .models import Enrollment
+from .versioning import bump_enrollment_versions, bump_level_versions
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def grade_changed(sender, instance, **kwargs):
+    bump_enrollment_versions([instance.enrollment_id])
+
+
+@receiver(post_save, sender=Student)
+def student_changed(sender, instance, created, **kwargs):
+    # Names and other details are printed on every card of the student
+    if not created:
+        bump_enrollment_versions(Enrollment.objects.filter(student_id=instance.id).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    # The roster changed; the enrollment's own counter is bumped by whoever changes its data
+    bump_level_versions([(instance.level_id, instance.academic_year_id)])
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_created(sender, instance, created, **kwargs):
+    # Every enrollment gets its status row up front, so listing statuses never writes
+    if created:
+        backfill_missing_statuses(enrollment_ids=[instance.id])
+
+
+@receiver(post_save, sender=PassFailedStatus)
+def status_changed(sender, instance, created, **kwargs):
+    # The yearly card template follows the status
+    if created or instance.status != getattr(instance, '_loaded_status', None):
+        bump_enrollment_versions(Enrollment.objects.filter(
+            student_id=instance.student_id, level_id=instance.level_id, academic_year_id=instance.academic_year_id
+        ).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def subject_changed(sender, instance, **kwargs):
+    # Subject rows are printed on every card of the level; this also bumps the level versions
+    bump_enrollment_versions(Enrollment.objects.filter(level_id=instance.level_id).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Level)
+def level_changed(sender, instance, created, **kwargs):
+    # The level name is printed on every card of the level
+    if not created:
+        bump_enrollment_versions(Enrollment.objects.filter(level_id=instance.id).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=AcademicYear)
+def academic_year_changed(sender, instance, created, **kwargs):
+    # The year name is printed on every card of the year
+    if not created:
+        bump_enrollment_versions(Enrollment.objects.filter(academic_year_id=instance.id).values_list('id', flat=True))
@@ -0,0 +1,63 @@
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Enrollment, LevelDataVersion
+
+logger = logging.getLogger(__name__)
+
+
+def bump_level_versions(level_year_pairs):
+    """Increment the LevelDataVersion of each (level_id, academic_year_id) pair."""
+    for level_id, academic_year_id in set(level_year_pairs):
+        updated = LevelDataVersion.objects.filter(
+            level_id=level_id, academic_year_id=academic_year_id
+        ).update(version=F('version') + 1)
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                LevelDataVersion.objects.create(level_id=level_id, academic_year_id=academic_year_id, version=1)
+        except IntegrityError:
+            # Another writer created the row first
+            LevelDataVersion.objects.filter(
+                level_id=level_id, academic_year_id=academic_year_id
+            ).update(version=F('version') + 1)
+
+
+def bump_enrollment_versions(enrollment_ids):
+    """Increment the version of each enrollment and of its level/year.
+
+    Call this after writes that bypass model signals (bulk_create, queryset.update).
+    """
+    enrollment_ids = set(enrollment_ids)
+    if not enrollment_ids:
+        return
+    enrollments = Enrollment.objects.filter(id__in=enrollment_ids)
+    enrollments.update(version=F('version') + 1)
+    bump_level_versions(enrollments.values_list('level_id', 'academic_year_id').distinct())
+    logger.debug(f"Bumped versions for enrollments {sorted(enrollment_ids)}")
+
+
+def bump_student_versions(student_id, level_id=None, academic_year_id=None):
+    """Bump the versions of a student's enrollments (optionally one level/year)."""
+    enrollments = Enrollment.objects.filter(student_id=student_id)
+    if level_id:
+        enrollments = enrollments.filter(level_id=level_id)
+    if academic_year_id:
+        enrollments = enrollments.filter(academic_year_id=academic_year_id)
+    bump_enrollment_versions(enrollments.values_list('id', flat=True))
+
+
+def get_enrollment_version(student_id, level_id, academic_year_id):
+    """Current version of a student's enrollment, or None if not enrolled."""
+    return Enrollment.objects.filter(
+        student_id=student_id, level_id=level_id, academic_year_id=academic_year_id
+    ).values_list('version', flat=True).first()
+
+
+def get_level_version(level_id, academic_year_id):
+    """Current version of a level's report card data in an academic year (0 if never changed)."""
+    version = LevelDataVersion.objects.filter(
+        level_id=level_id, academic_year_id=academic_year_id
+    ).values_list('version', flat=True).first()
+    return version or 0
@@ -1,83 +1,170 @@
+import logging
+from django.db import transaction
 from rest_framework.response import Response
 from rest_framework import status
+from pass_and_failed.backfill import backfill_missing_statuses
 from pass_and_failed.models import PassFailedStatus
 from enrollment.models import Enrollment
+from enrollment.versioning import bump_level_versions
 from academic_years.models import AcademicYear
 from grades.models import Grade
 from levels.models import Level
 from subjects.models import Subject
 from datetime import date, timedelta
 
+logger = logging.getLogger(__name__)
 
-def promote_student_if_eligible(status_obj, logger):
+
+def get_next_academic_year(academic_year, logger, create=True):
+    """Get or create the academic year following academic_year ('2024/2025' -> '2025/2026').
+
+    With create=False a missing year is returned unsaved. Returns None if the name cannot be parsed.
+    """
     try:
-        current_level = status_obj.level
-        current_level_name = current_level.name
-        try:
-            current_level_number = int(current_level_name)  # Assume name is '1', '2', etc.
-            next_level_number = current_level_number + 1
-            next_level = Level.objects.filter(name=str(next_level_number)).first()
-        except (ValueError, TypeError):
-            logger.warning(f"Level name {current_level_name} is not numeric, cannot promote")
-            return
+        current_year = int(academic_year.name.split('/')[0])
+    except (ValueError, TypeError):
+        logger.error(f"Cannot parse academic year {academic_year.name} for promotion")
+        return None
+    next_year = current_year + 1
+    next_academic_year_name = f"{next_year}/{next_year + 1}"
+    defaults = {
+        'start_date': date(next_year, 9, 1),
+        'end_date': date(next_year + 1, 6, 30)
+    }
+    if not create:
+        return AcademicYear.objects.filter(name=next_academic_year_name).first() or AcademicYear(
+            name=next_academic_year_name, **defaults
+        )
+    next_academic_year, created = AcademicYear.objects.get_or_create(name=next_academic_year_name, defaults=defaults)
+    if created:
+        logger.info(f"Created new AcademicYear: {next_academic_year_name}")
+    return next_academic_year
 
-        if not next_level:
-            logger.warning(f"No higher level found for promotion from level {current_level.id}")
-            return
 
-        # Get or create the next academic year
-        current_academic_year = status_obj.academic_year
+def get_next_levels(level_ids, logger):
+    """Map each level id to the level promoted students move into (name '3' -> '4'), in one query."""
+    levels_by_name = {level.name: level for level in Level.objects.all()}
+    next_levels = {}
+    for level in levels_by_name.values():
+        if level.id not in level_ids:
+            continue
         try:
-            current_year = int(current_academic_year.name.split('/')[0])
-            next_year = current_year + 1
-            next_academic_year_name = f"{next_year}/{next_year + 1}"
-            next_academic_year, created = AcademicYear.objects.get_or_create(
-                name=next_academic_year_name,
-                defaults={
-                    'start_date': date(next_year, 9, 1),
-                    'end_date': date(next_year + 1, 6, 30)
-                }
-            )
-            if created:
-                logger.info(f"Created new AcademicYear: {next_academic_year_name}")
+            next_level = levels_by_name.get(str(int(level.name) + 1))
         except (ValueError, TypeError):
-            logger.error(f"Cannot parse academic year {current_academic_year.name} for promotion")
-            return
+            logger.warning(f"Level name {level.name} is not numeric, cannot promote")
+            continue
+        if next_level:
+            next_levels[level.id] = next_level
+        else:
+            logger.warning(f"No higher level found for promotion from level {level.id}")
+    return next_levels
+
+
+def promote_students_bulk(academic_year, student_levels, logger, dry_run=False):
+    """Set-based promote_student_if_eligible for many (student_id, level_id) pairs of one academic year.
+
+    The next levels and the next academic year are resolved once. Students
+    already enrolled in their next level are re-marked ENROLLED and skipped;
+    students enrolled next year in a different level are left alone and
+    counted as conflicts; the rest get their enrollment in one bulk insert.
+    With dry_run nothing is written (not even the next academic year).
+
+    Returns a report dict with created, skipped, conflicts and unpromotable counts.
+    """
+    student_levels = set(student_levels)
+    report = {'created': 0, 'skipped': 0, 'conflicts': 0, 'unpromotable': 0, 'next_academic_year': None, 'dry_run': dry_run}
+    if not student_levels:
+        return report
+    next_levels = get_next_levels({level_id for _, level_id in student_levels}, logger)
+    next_academic_year = get_next_academic_year(academic_year, logger, create=not dry_run)
+    if next_academic_year is None:
+        report['unpromotable'] = len(student_levels)
+        return report
+    report['next_academic_year'] = next_academic_year.name
 
-        current_enrollment = Enrollment.objects.filter(
-            student=status_obj.student,
-            level=current_level,
-            academic_year=current_academic_year
-        ).first()
-
-        if current_enrollment:
-            # Check if enrollment for next level and next academic year exists
-            next_enrollment = Enrollment.objects.filter(
-                student=status_obj.student,
-                level=next_level,
-                academic_year=next_academic_year
-            ).first()
-
-            if next_enrollment:
-                logger.info(f"Enrollment already exists for student {status_obj.student.id} at level {next_level.id}, academic_year {next_academic_year.name}")
-                # Update existing enrollment
-                next_enrollment.enrollment_status = 'ENROLLED'
-                next_enrollment.save()
-            else:
-                # Create new enrollment for next level and next academic year
-                Enrollment.objects.create(
-                    student=status_obj.student,
-                    level=next_level,
-                    academic_year=next_academic_year,
-                    date_enrolled=next_academic_year.start_date,
-                    enrollment_status='ENROLLED'
-                )
-                logger.info(f"Student {status_obj.student.id} auto-promoted to level {next_level.id}, academic_year {next_academic_year.name}")
-
-            # Update PassFailedStatus
-            status_obj.status = 'PASS' if status_obj.status == 'PASS' else 'CONDITIONAL'
-            status_obj.save()
+    targets = {}
+    for student_id, level_id in student_levels:
+        if level_id in next_levels:
+            targets[student_id] = next_levels[level_id].id
         else:
-            logger.warning(f"No current enrollment found for student {status_obj.student.id}")
+            report['unpromotable'] += 1
+
+    # Every next-year enrollment of these students, in one query
+    enrolled_next_year = {}
+    if next_academic_year.pk and targets:
+        for student_id, level_id in Enrollment.objects.filter(
+            academic_year=next_academic_year, student_id__in=targets
+        ).values_list('student_id', 'level_id'):
+            enrolled_next_year.setdefault(student_id, set()).add(level_id)
+
+    new_enrollments = []
+    already_enrolled = {}
+    for student_id, next_level_id in targets.items():
+        levels = enrolled_next_year.get(student_id)
+        if not levels:
+            new_enrollments.append(Enrollment(
+                student_id=student_id,
+                level_id=next_level_id,
+                academic_year=next_academic_year,
+                date_enrolled=next_academic_year.start_date,
+                enrollment_status='ENROLLED'
+            ))
+        elif next_level_id in levels:
+            already_enrolled.setdefault(next_level_id, []).append(student_id)
+            report['skipped'] += 1
+        else:
+            logger.warning(f"Student {student_id} is already enrolled in another level for {next_academic_year.name}, not promoting")
+            report['conflicts'] += 1
+    report['created'] = len(new_enrollments)
+    if dry_run:
+        return report
+
+    changed_levels = set()
+    for next_level_id, student_ids in already_enrolled.items():
+        if Enrollment.objects.filter(
+            academic_year=next_academic_year, level_id=next_level_id, student_id__in=student_ids
+        ).exclude(enrollment_status='ENROLLED').update(enrollment_status='ENROLLED'):
+            changed_levels.add(next_level_id)
+    if new_enrollments:
+        Enrollment.objects.bulk_create(new_enrollments, ignore_conflicts=True)
+        changed_levels.update(enrollment.level_id for enrollment in new_enrollments)
+        # bulk_create skips the post_save receiver that gives new enrollments a status
+        backfill_missing_statuses(academic_year_id=next_academic_year.id)
+        logger.info(f"Auto-promoted {len(new_enrollments)} students into academic_year {next_academic_year.name}")
+    # Bulk writes skip the post_save roster bump
+    bump_level_versions((level_id, next_academic_year.id) for level_id in changed_levels)
+    return report
+
+
+def rollover_academic_year(academic_year_id, dry_run=False):
+    """Year-end promotion: enroll every PASS/CONDITIONAL student of a year in their next level.
+
+    Uses the stored PassFailedStatus rows, so validated statuses are respected.
+    Runs in one transaction; see promote_students_bulk for the report.
+    """
+    academic_year = AcademicYear.objects.get(id=academic_year_id)
+    with transaction.atomic():
+        enrolled = set(Enrollment.objects.filter(academic_year=academic_year).values_list('student_id', 'level_id'))
+        promoted = PassFailedStatus.objects.filter(
+            academic_year=academic_year, status__in=['PASS', 'CONDITIONAL']
+        ).values_list('student_id', 'level_id')
+        eligible = [pair for pair in promoted if pair in enrolled]
+        report = promote_students_bulk(academic_year, eligible, logger, dry_run=dry_run)
+    report['academic_year'] = academic_year.name
+    report['eligible'] = len(eligible)
+    logger.info(f"{'Dry-run rollover' if dry_run else 'Rollover'} of {academic_year.name}: {report}")
+    return report
+
+
+def promote_student_if_eligible(status_obj, logger):
+    try:
+        if not Enrollment.objects.filter(
+            student_id=status_obj.student_id,
+            level_id=status_obj.level_id,
+            academic_year_id=status_obj.academic_year_id
+        ).exists():
+            logger.warning(f"No current enrollment found for student {status_obj.student_id}")
+            return
+        promote_students_bulk(status_obj.academic_year, [(status_obj.student_id, status_obj.level_id)], logger)
     except Exception as e:
-        logger.error(f"Error promoting student {status_obj.student.id}: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error promoting student {status_obj.student_id}: {str(e)}")
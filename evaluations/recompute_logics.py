@@ -0,0 +1,24 @@
+import logging
+from .statues_logics import persist_statuses_bulk
+
+logger = logging.getLogger(__name__)
+
+
+def recompute_statuses(level_id, academic_year_id, student_ids):
+    """Re-evaluate the stored statuses of students whose grades changed, once per batch.
+
+    Runs synchronously inside the request: persist_statuses_bulk costs a fixed
+    number of queries however many students changed, so there is nothing to
+    defer, and no pending work to lose on a restart. Returns the number of
+    students evaluated.
+    """
+    student_ids = set(student_ids)
+    if not student_ids:
+        return 0
+    try:
+        persist_statuses_bulk(academic_year_id, level_id, student_ids=student_ids)
+    except Exception as e:
+        logger.error(f"Error recomputing statuses for level {level_id}, year {academic_year_id}: {str(e)}")
+        return 0
+    logger.info(f"Recomputed {len(student_ids)} pass/fail statuses")
+    return len(student_ids)
@@ -8,7 +8,12 @@ from grades.models import Grade, GradePolicy
 from levels.models import Level
 from subjects.models import Subject
 from datetime import date, timedelta
-from .promotional_logics import promote_student_if_eligible
+from django.db import transaction
+from django.db.models import Avg, Count
+from enrollment.versioning import bump_enrollment_versions
+from grades.helper import get_grade_pivot
+from school_configs.rules import get_level_evaluators, get_subject_finals, subject_final
+from .promotional_logics import promote_student_if_eligible, promote_students_bulk
 
 
 def handle_validate_status(view, request, pk, logger):
@@ -39,56 +44,221 @@ def handle_validate_status(view, request, pk, logger):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def determine_pass_fail(student_id, level_id, academic_year_id):
-    """Calculate pass/fail status based on grades and update PassFailedStatus."""
-    try:
-        enrollment = Enrollment.objects.get(student_id=student_id, level_id=level_id, academic_year_id=academic_year_id)
-        grades = Grade.objects.filter(enrollment=enrollment)
-        subjects = Subject.objects.filter(level_id=level_id)
-        policy = GradePolicy.objects.filter(level_id=level_id).first()
-        required_grades = policy.required_grades if policy else 8
-        passing_threshold = policy.passing_threshold if policy else 50
-        conditional_threshold = policy.conditional_threshold if policy and hasattr(policy, 'conditional_threshold') else 40  # Assume conditional threshold
-
-        if not grades.exists():
-            status = 'INCOMPLETE'
+def get_status_thresholds(level_id):
+    """Return (required_grades, passing_threshold, conditional_threshold) for a level."""
+    return thresholds_from_policy(GradePolicy.objects.filter(level_id=level_id).first())
+
+
+def thresholds_from_policy(policy):
+    """(required_grades, passing_threshold, conditional_threshold) from a GradePolicy, or the defaults if None."""
+    required_grades = policy.required_grades if policy else 8
+    passing_threshold = policy.passing_threshold if policy else 50
+    conditional_threshold = policy.conditional_threshold if policy and hasattr(policy, 'conditional_threshold') else 40  # Assume conditional threshold
+    return required_grades, passing_threshold, conditional_threshold
+
+
+def evaluate_status(subject_scores, subject_ids, thresholds):
+    """Compute a status in memory from a subject_id -> period -> score map. Never writes."""
+    subject_stats = {
+        subject_id: (len(scores), sum(scores.values()) / len(scores))
+        for subject_id, scores in subject_scores.items() if scores
+    }
+    return evaluate_subject_stats(subject_stats, subject_ids, thresholds)
+
+
+def evaluate_subject_stats(subject_stats, subject_ids, thresholds):
+    """Compute a status from a subject_id -> (grade count, average score) map. Never writes."""
+    required_grades, passing_threshold, conditional_threshold = thresholds
+
+    if not any(count for count, _ in subject_stats.values()):
+        return 'INCOMPLETE'
+
+    status = 'PASS'  # Default to PASS, adjust based on checks
+    for subject_id in subject_ids:
+        count, avg_score = subject_stats.get(subject_id, (0, None))
+        if count < required_grades or avg_score is None:
+            return 'INCOMPLETE'
+        if avg_score < passing_threshold:
+            if avg_score >= conditional_threshold:
+                status = 'CONDITIONAL'
+            else:
+                return 'FAIL'
+    return status
+
+
+def get_level_evaluator(level_id):
+    """Return evaluate(subject_scores, subject_ids) -> status for a level.
+
+    Levels with a LevelConfig use its compiled rule on the subject finals;
+    the others use their GradePolicy thresholds (see evaluate_status).
+    """
+    rule = get_level_evaluators([level_id]).get(int(level_id))
+    if rule:
+        def evaluate(subject_scores, subject_ids):
+            return rule([subject_final(subject_scores.get(subject_id, {})) for subject_id in subject_ids])
+        return evaluate
+
+    thresholds = get_status_thresholds(level_id)
+
+    def evaluate(subject_scores, subject_ids):
+        return evaluate_status(subject_scores, subject_ids, thresholds)
+    return evaluate
+
+
+def evaluate_statuses_bulk(academic_year_id, level_id=None, student_ids=None):
+    """Compute the status of every enrollment in a year (optionally one level / some students).
+
+    Uses one grouped Count/Avg query over the grades instead of a query per
+    student; levels with a LevelConfig instead get one query pivoting their
+    grades into subject finals, fed to the level's compiled rule. Returns a list of (enrollment dict, status), where each
+    enrollment dict has id, student_id and level_id. Never writes.
+    """
+    enrollments = Enrollment.objects.filter(academic_year_id=academic_year_id)
+    if level_id:
+        enrollments = enrollments.filter(level_id=level_id)
+    if student_ids is not None:
+        enrollments = enrollments.filter(student_id__in=student_ids)
+    enrollments = list(enrollments.values('id', 'student_id', 'level_id'))
+    if not enrollments:
+        return []
+    level_ids = {enrollment['level_id'] for enrollment in enrollments}
+
+    subjects_by_level = {}
+    for subject_level_id, subject_id in Subject.objects.filter(level_id__in=level_ids).values_list('level_id', 'id'):
+        subjects_by_level.setdefault(subject_level_id, []).append(subject_id)
+
+    rules = get_level_evaluators(level_ids)
+    policy_levels = level_ids - set(rules)
+
+    grades = Grade.objects.filter(enrollment__academic_year_id=academic_year_id)
+    if level_id:
+        grades = grades.filter(enrollment__level_id=level_id)
+    if student_ids is not None:
+        grades = grades.filter(enrollment__student_id__in=student_ids)
+
+    stats = {}
+    thresholds = {}
+    if policy_levels:
+        policies = {policy.level_id: policy for policy in GradePolicy.objects.filter(level_id__in=policy_levels)}
+        thresholds = {lvl: thresholds_from_policy(policies.get(lvl)) for lvl in policy_levels}
+        rows = grades.filter(enrollment__level_id__in=policy_levels).values(
+            'enrollment_id', 'subject_id'
+        ).annotate(count=Count('id'), average=Avg('score')).order_by()
+        for row in rows:
+            stats.setdefault(row['enrollment_id'], {})[row['subject_id']] = (row['count'], row['average'])
+    finals = get_subject_finals(grades.filter(enrollment__level_id__in=rules)) if rules else {}
+
+    results = []
+    for enrollment in enrollments:
+        subject_ids = subjects_by_level.get(enrollment['level_id'], [])
+        rule = rules.get(enrollment['level_id'])
+        if rule:
+            subject_finals = finals.get(enrollment['id'], {})
+            status_value = rule([subject_finals.get(subject_id) for subject_id in subject_ids])
         else:
-            status = 'PASS'  # Default to PASS, adjust based on checks
-            for subject in subjects:
-                subject_grades = grades.filter(subject=subject)
-                if subject_grades.count() < required_grades:
-                    status = 'INCOMPLETE'
-                    break
-                avg_score = sum(g.score for g in subject_grades) / subject_grades.count()
-                if avg_score < passing_threshold:
-                    if avg_score >= conditional_threshold:
-                        status = 'CONDITIONAL'
-                    else:
-                        status = 'FAIL'
-                        break
-
-        # Update or create PassFailedStatus
-        pass_failed_status, created = PassFailedStatus.objects.update_or_create(
-            student_id=student_id,
-            level_id=level_id,
+            status_value = evaluate_subject_stats(
+                stats.get(enrollment['id'], {}), subject_ids, thresholds[enrollment['level_id']]
+            )
+        results.append((enrollment, status_value))
+    return results
+
+
+def persist_statuses_bulk(academic_year_id, level_id=None, student_ids=None):
+    """Evaluate and store PassFailedStatus for every matching enrollment, promoting as needed.
+
+    One aggregate read, one upsert of the rows that are new or changed, one
+    promotion pass, all in one transaction; see evaluate_statuses_bulk.
+    Returns a status -> count map.
+    """
+    results = evaluate_statuses_bulk(academic_year_id, level_id, student_ids)
+    if not results:
+        return {}
+
+    previous = PassFailedStatus.objects.filter(academic_year_id=academic_year_id)
+    if level_id:
+        previous = previous.filter(level_id=level_id)
+    if student_ids is not None:
+        previous = previous.filter(student_id__in=student_ids)
+    previous = {
+        (student, level): stored
+        for student, level, *stored in previous.values_list(
+            'student_id', 'level_id', 'status', 'enrollment_id', 'grades_complete', 'template_name'
+        )
+    }
+
+    rows = []
+    counts = {}
+    changed_enrollments = []
+    for enrollment, status_value in results:
+        counts[status_value] = counts.get(status_value, 0) + 1
+        grades_complete = status_value not in ['INCOMPLETE']
+        template_name = PassFailedStatus.TEMPLATE_NAMES.get(status_value, '')
+        stored = previous.get((enrollment['student_id'], enrollment['level_id']))
+        if stored == [status_value, enrollment['id'], grades_complete, template_name]:
+            continue
+        if stored is None or stored[0] != status_value:
+            changed_enrollments.append(enrollment['id'])
+        rows.append(PassFailedStatus(
+            student_id=enrollment['student_id'],
+            level_id=enrollment['level_id'],
             academic_year_id=academic_year_id,
-            defaults={
-                'status': status,
-                'enrollment': enrollment,
-                'grades_complete': status not in ['INCOMPLETE'],
-            }
+            enrollment_id=enrollment['id'],
+            status=status_value,
+            grades_complete=grades_complete,
+            template_name=template_name,
+        ))
+
+    with transaction.atomic():
+        PassFailedStatus.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['student', 'level', 'academic_year'],
+            update_fields=['status', 'enrollment', 'grades_complete', 'template_name'],
         )
-        logger.info(f"{'Created' if created else 'Updated'} PassFailedStatus for student {student_id}, level {level_id}, year {academic_year_id}: {status}")
+        # bulk_create skips the post_save signal that moves the yearly card's version
+        bump_enrollment_versions(changed_enrollments)
+        # Same transaction: a failed promotion rolls the statuses back, so a retry redoes both
+        promote_students_bulk(
+            AcademicYear.objects.get(id=academic_year_id),
+            [(enrollment['student_id'], enrollment['level_id']) for enrollment, status_value in results
+             if status_value in ['PASS', 'CONDITIONAL']],
+            logger,
+        )
+    logger.info(f"Persisted {len(rows)} new or changed statuses for year {academic_year_id}{f', level {level_id}' if level_id else ''}: {counts}")
+    return counts
 
-        # Trigger promotion if PASS or CONDITIONAL
-        if status in ['PASS', 'CONDITIONAL']:
-            promote_student_if_eligible(pass_failed_status, logger)
 
-        return status
-    except Enrollment.DoesNotExist:
-        logger.error(f"No enrollment found for student_id={student_id}, level_id={level_id}, academic_year_id={academic_year_id}")
+def compute_pass_fail(student_id, level_id, academic_year_id, grade_pivot=None):
+    """Read-only pass/fail evaluation for display; does not touch PassFailedStatus or enrollments."""
+    try:
+        if not Enrollment.objects.filter(student_id=student_id, level_id=level_id, academic_year_id=academic_year_id).exists():
+            logger.error(f"No enrollment found for student_id={student_id}, level_id={level_id}, academic_year_id={academic_year_id}")
+            return 'INCOMPLETE'
+        if grade_pivot is None:
+            grade_pivot = get_grade_pivot(level_id, academic_year_id, student_id=student_id)
+        subject_ids = list(Subject.objects.filter(level_id=level_id).values_list('id', flat=True))
+        return get_level_evaluator(level_id)(grade_pivot.get(int(student_id), {}), subject_ids)
+    except Exception as e:
+        logger.error(f"Error computing pass/fail for student {student_id}: {str(e)}")
         return 'INCOMPLETE'
+
+
+def determine_pass_fail(student_id, level_id, academic_year_id):
+    """Calculate pass/fail status based on grades and update PassFailedStatus."""
+    try:
+        if not Enrollment.objects.filter(student_id=student_id, level_id=level_id, academic_year_id=academic_year_id).exists():
+            logger.error(f"No enrollment found for student_id={student_id}, level_id={level_id}, academic_year_id={academic_year_id}")
+            return 'INCOMPLETE'
+        counts = persist_statuses_bulk(academic_year_id, level_id, student_ids=[student_id])
+        return next(iter(counts), 'INCOMPLETE')
     except Exception as e:
         logger.error(f"Error determining pass/fail for student {student_id}: {str(e)}")
         return 'INCOMPLETE'
 
+
+def persist_level_statuses(level_id, academic_year_id):
+    """Evaluate and store PassFailedStatus for every enrollment in a level/year, promoting as needed.
+
+    This is the explicit write counterpart to ``compute_pass_fail``. Returns a status -> count map.
+    """
+    return persist_statuses_bulk(academic_year_id, level_id)
@@ -3,6 +3,8 @@ from django.contrib import admin
 # Register your models here.
 from .models import StudentGradeSheetPDF
 from .models import LevelGradeSheetPDF
+from .models import PDFRenderJob
 
 admin.site.register(StudentGradeSheetPDF)
-admin.site.register(LevelGradeSheetPDF)
\ No newline at end of file
+admin.site.register(LevelGradeSheetPDF)
+admin.site.register(PDFRenderJob)
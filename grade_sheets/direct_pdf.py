@@ -0,0 +1,266 @@
+import logging
+import os
+import zlib
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the drawing code changes so cached PDFs from the old layout are not reused.
+LAYOUT_VERSION = '1'
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter in points, as in the DOCX templates
+MARGIN = 72
+
+# Column layout of report_card_compact.docx / yearly_card_*.docx: the first semester
+# table (subject, 1st-3rd periods, exam, semester average) followed by the second
+# semester table (4th-6th periods, exam, semester average, yearly average).
+COLUMNS = [
+    ('SUBJECT', None, 'sn', 108),
+    ('1st', 'PD.', '1st', 33),
+    ('2nd', 'PD.', '2nd', 33),
+    ('3rd', 'PD.', '3rd', 33),
+    ('Ex-', 'am', '1exam', 32),
+    ('Sem.', 'Ave.', '1a', 33),
+    ('4TH', 'PD.', '4th', 33),
+    ('5TH', 'PD.', '5th', 33),
+    ('6TH', 'PD.', '6th', 33),
+    ('EXAM', None, '2exam', 32),
+    ('SEM.', 'AVE.', '2a', 33),
+    ('YRLY.', 'AVE.', 'f', 34),
+]
+SEMESTER_GROUPS = [('FIRST SEMESTER', 1, 5), ('SECOND SEMESTER', 6, 11)]
+FOOTER_ROWS = ['Average', 'Rank', 'Days present', 'Days Absent', 'Conduct']
+SUBJECT_ROWS = 9
+
+CARD_LAYOUTS = {
+    'periodic': {'title': 'REPORT CARD', 'remark': None},
+    'yearly_pass': {'title': 'YEARLY REPORT CARD', 'remark': 'Promoted to the next grade.'},
+    'yearly_conditional': {'title': 'YEARLY REPORT CARD', 'remark': 'Promoted on condition.'},
+    'yearly_failed': {'title': 'YEARLY REPORT CARD', 'remark': 'Not promoted. Must repeat the grade.'},
+}
+TEMPLATE_LAYOUTS = {
+    'yearly_card_pass.docx': 'yearly_pass',
+    'yearly_card_conditional.docx': 'yearly_conditional',
+    'yearly_card_failed.docx': 'yearly_failed',
+}
+
+# Advance widths (1/1000 em) of the standard Helvetica fonts for ASCII 32-126.
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+FONTS = {'F1': ('Helvetica', _HELVETICA_WIDTHS), 'F2': ('Helvetica-Bold', _HELVETICA_BOLD_WIDTHS)}
+
+
+def get_report_card_renderer():
+    """'docx' fills the DOCX templates and converts them; 'direct' draws PDFs here."""
+    return getattr(settings, 'REPORT_CARD_RENDERER', 'docx')
+
+
+def get_layout_name(template_path):
+    """Direct-render layout matching a DOCX template path."""
+    return TEMPLATE_LAYOUTS.get(os.path.basename(str(template_path)), 'periodic')
+
+
+def text_width(text, font, size):
+    widths = FONTS[font][1]
+    return sum(widths[ord(c) - 32] if 32 <= ord(c) <= 126 else 556 for c in text) * size / 1000
+
+
+def fit_text(text, font, size, max_width):
+    """Truncate text with '...' so it fits max_width points."""
+    if text_width(text, font, size) <= max_width:
+        return text
+    while text and text_width(text + '...', font, size) > max_width:
+        text = text[:-1]
+    return text + '...'
+
+
+def _escape(text):
+    encoded = str(text).encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class _Page:
+    """Content stream operators for one page."""
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, y, text, font='F1', size=9, align='left', width=0):
+        if align == 'center':
+            x += (width - text_width(text, font, size)) / 2
+        elif align == 'right':
+            x += width - text_width(text, font, size)
+        self.ops.append(b'BT /%s %g Tf %.2f %.2f Td (%s) Tj ET' % (font.encode(), size, x, y, _escape(text)))
+
+    def rect(self, x, y, width, height):
+        self.ops.append(b'%.2f %.2f %.2f %.2f re S' % (x, y, width, height))
+
+    def line(self, x1, y1, x2, y2):
+        self.ops.append(b'%.2f %.2f m %.2f %.2f l S' % (x1, y1, x2, y2))
+
+    def content(self):
+        return zlib.compress(b'0.6 w\n' + b'\n'.join(self.ops))
+
+
+def _draw_card(page, data, layout):
+    y = PAGE_HEIGHT - MARGIN
+    page.text(MARGIN, y, layout['title'], font='F2', size=14, align='center', width=PAGE_WIDTH - 2 * MARGIN)
+    y -= 28
+    page.text(MARGIN, y, f"Student: {data.get('name', '')}", font='F2', size=10)
+    page.text(MARGIN + 250, y, f"Grade {data.get('level', '')}", font='F2', size=10)
+    page.text(MARGIN, y, f"School Year {data.get('academic_year', '')}", font='F2', size=10,
+              align='right', width=PAGE_WIDTH - 2 * MARGIN)
+    y -= 14
+
+    x_positions = [MARGIN]
+    for column in COLUMNS:
+        x_positions.append(x_positions[-1] + column[3])
+
+    # Semester group headers above the column headers
+    group_height = 14
+    for title, first, last in SEMESTER_GROUPS:
+        left, right = x_positions[first], x_positions[last + 1]
+        page.rect(left, y - group_height, right - left, group_height)
+        page.text(left, y - group_height + 4, title, font='F2', size=8, align='center', width=right - left)
+    y -= group_height
+
+    header_height = 22
+    for index, (line1, line2, _, width) in enumerate(COLUMNS):
+        x = x_positions[index]
+        page.rect(x, y - header_height, width, header_height)
+        if line2:
+            page.text(x, y - 9, line1, font='F2', size=7, align='center', width=width)
+            page.text(x, y - 18, line2, font='F2', size=7, align='center', width=width)
+        else:
+            page.text(x, y - 14, line1, font='F2', size=7, align='center', width=width)
+    y -= header_height
+
+    row_height = 16
+    subjects = data.get('s', [])
+    for row in range(SUBJECT_ROWS):
+        subject = subjects[row] if row < len(subjects) else {}
+        for index, (_, _, key, width) in enumerate(COLUMNS):
+            x = x_positions[index]
+            page.rect(x, y - row_height, width, row_height)
+            value = str(subject.get(key, '-' if key != 'sn' else ''))
+            if key == 'sn':
+                page.text(x + 3, y - 11, fit_text(value, 'F1', 8, width - 6), size=8)
+            else:
+                page.text(x, y - 11, value, size=9, align='center', width=width)
+        y -= row_height
+
+    for label in FOOTER_ROWS:
+        for index, (_, _, key, width) in enumerate(COLUMNS):
+            page.rect(x_positions[index], y - row_height, width, row_height)
+        page.text(x_positions[0] + 3, y - 11, label, font='F2', size=8)
+        y -= row_height
+
+    if layout['remark']:
+        y -= 24
+        page.text(MARGIN, y, f"Status: {data.get('status', '')}", font='F2', size=10)
+        y -= 16
+        page.text(MARGIN, y, layout['remark'], size=10)
+    y -= 48
+    page.line(MARGIN, y, MARGIN + 180, y)
+    page.line(PAGE_WIDTH - MARGIN - 180, y, PAGE_WIDTH - MARGIN, y)
+    page.text(MARGIN, y - 12, 'Class Sponsor', size=8, align='center', width=180)
+    page.text(PAGE_WIDTH - MARGIN - 180, y - 12, 'Principal', size=8, align='center', width=180)
+
+
+def _build_pdf(pages):
+    """Serialize pages into a PDF file using the two standard Helvetica fonts."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # Pages tree, filled in once page object numbers are known
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    page_refs = []
+    for page in pages:
+        content = page.content() if page else zlib.compress(b'')
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(content), content))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>' % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        )
+        page_refs.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(page_refs), len(page_refs))
+
+    output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref_offset = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        output += b'%010d 00000 n \n' % offset
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+
+def render_cards_document(cards, pad_to_even=False):
+    """Draw many report cards into one PDF in a single pass, one page per card.
+
+    cards is a list of (template_path, data); the template path only selects
+    the matching layout. A blank page is appended for duplex printing when
+    pad_to_even is set and the card count is odd.
+    """
+    pages = []
+    for template_path, data in cards:
+        page = _Page()
+        _draw_card(page, data, CARD_LAYOUTS[get_layout_name(template_path)])
+        pages.append(page)
+    if pad_to_even and len(pages) % 2 == 1:
+        pages.append(None)
+    logger.debug(f"Drew {len(cards)} report cards directly to PDF")
+    return _build_pdf(pages)
+
+
+def render_card_pdf(template_path, data):
+    """Draw a single student's report card. Returns PDF bytes."""
+    return render_cards_document([(template_path, data)])
+
+
+def render_level_document(tasks, pad_to_even=False, progress_callback=None):
+    """Draw a whole level's cards (parallel_render.CardTask) into one PDF in a single pass.
+
+    Returns (pdf_bytes, page_index, failures). page_index has the same shape as
+    parallel_render.build_page_index; pdf_bytes is None when no card was drawn.
+    """
+    pages = []
+    page_index = {}
+    failures = []
+    for finished, task in enumerate(tasks, start=1):
+        try:
+            if not task.data or 'name' not in task.data:
+                raise ValueError(f"No grade sheet data for student_id={task.student_id}")
+            page = _Page()
+            _draw_card(page, task.data, CARD_LAYOUTS[get_layout_name(task.template_path)])
+            page_index[str(task.student_id)] = {'start': len(pages), 'end': len(pages), 'key': task.cache_key}
+            pages.append(page)
+        except Exception as e:
+            logger.error(f"Direct render failed for student_id={task.student_id}: {str(e)}")
+            failures.append((task.student_id, str(e)))
+        if progress_callback:
+            progress_callback(finished, len(tasks), len(failures))
+    if not pages:
+        return None, page_index, failures
+    if pad_to_even and len(pages) % 2 == 1:
+        pages.append(None)
+    logger.info(f"Drew {len(page_index)}/{len(tasks)} cards directly into one document")
+    return _build_pdf(pages), page_index, failures
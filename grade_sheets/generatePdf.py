@@ -4,6 +4,7 @@ from django.conf import settings
 from grade_sheets.periodic_pdf import generate_grade_pdf
 from grade_sheets.periodic_level_pdf import generate_periodic_level_pdf
 from grade_sheets.yearly_pdf import generate_yearly_pdf
+from grade_sheets.locks import RenderInProgress, render_lock_key, single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +43,7 @@ def get_template_path(template_name=None, is_yearly=False, pass_template=True, c
     logger.debug(f"Selected template: {template_path}")
     return template_path
 
-def generate_gradesheet_pdf(level_id, student_id=None, academic_year_id=None):
+def generate_gradesheet_pdf(level_id, student_id=None, academic_year_id=None, progress_callback=None, wait_timeout=None):
     """
     Generate periodic PDF grade sheets for a student or level.
     
@@ -50,24 +51,32 @@ def generate_gradesheet_pdf(level_id, student_id=None, academic_year_id=None):
         level_id: ID of the level.
         student_id: ID of the student (optional).
         academic_year_id: ID of the academic year (optional).
+        progress_callback: Called with (finished, total, failed) cards during level renders (optional).
+        wait_timeout: Seconds to wait for a concurrent render of the same PDF (default PDF_RENDER_LOCK_WAIT).
     
     Returns:
         List of PDF paths.
+
+    Raises:
+        RenderInProgress: Another process is still rendering the same PDF after wait_timeout.
     """
     try:
         os.makedirs(OUTPUT_DIR, exist_ok=True)
         template_path = get_template_path(is_yearly=False)
+        key = render_lock_key('periodic', level_id, academic_year_id, student_id)
         if student_id:
             # Generate for a single student
-            return generate_grade_pdf(template_path, student_id, level_id, academic_year_id)
+            return single_flight(key, lambda: generate_grade_pdf(template_path, student_id, level_id, academic_year_id), wait_timeout)
         else:
             # Generate for all students in the level
-            return generate_periodic_level_pdf(template_path, level_id, academic_year_id)
+            return single_flight(key, lambda: generate_periodic_level_pdf(template_path, level_id, academic_year_id, progress_callback=progress_callback), wait_timeout)
+    except RenderInProgress:
+        raise
     except Exception as e:
         logger.error(f"Error generating periodic PDF: {str(e)}")
         return []
 
-def generate_yearly_gradesheet_pdf(level_id, student_id=None, pass_template=True, conditional=False, academic_year_id=None):
+def generate_yearly_gradesheet_pdf(level_id, student_id=None, pass_template=True, conditional=False, academic_year_id=None, progress_callback=None, wait_timeout=None):
     """
     Generate yearly report card PDFs by calling yearly_pdf.py.
     
@@ -77,13 +86,25 @@ def generate_yearly_gradesheet_pdf(level_id, student_id=None, pass_template=True
         pass_template: Use pass template (default True).
         conditional: Use conditional template (default False).
         academic_year_id: ID of the academic year (optional).
+        progress_callback: Called with (finished, total, failed) cards during level renders (optional).
+        wait_timeout: Seconds to wait for a concurrent render of the same PDF (default PDF_RENDER_LOCK_WAIT).
     
     Returns:
         List of PDF paths.
+
+    Raises:
+        RenderInProgress: Another process is still rendering the same PDF after wait_timeout.
     """
     try:
         os.makedirs(OUTPUT_DIR, exist_ok=True)
-        return generate_yearly_pdf(level_id, student_id, pass_template, conditional, academic_year_id)
+        key = render_lock_key('yearly', level_id, academic_year_id, student_id)
+        return single_flight(
+            key,
+            lambda: generate_yearly_pdf(level_id, student_id, pass_template, conditional, academic_year_id, progress_callback),
+            wait_timeout
+        )
+    except RenderInProgress:
+        raise
     except Exception as e:
         logger.error(f"Error generating yearly PDF: {str(e)}")
         return []
\ No newline at end of file
@@ -1,80 +1,94 @@
 from enrollment.models import Enrollment
-from grades.models import Grade
+from grades.helper import get_grade_pivot
 from subjects.models import Subject
 from periods.models import Period
-from .utils import determine_pass_fail
+from evaluations.statues_logics import compute_pass_fail, get_level_evaluator
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_grade_sheet_data(student_id, level_id, academic_year_id=None, is_yearly=False):
-    """Compile grade data for a student, level, and optional academic year."""
-    try:
-        enrollment = Enrollment.objects.get(student_id=student_id, level_id=level_id, academic_year_id=academic_year_id)
-        grades = Grade.objects.filter(enrollment=enrollment).select_related('subject', 'period')
-        subjects = Subject.objects.filter(level_id=level_id)
-        periods = Period.objects.all()
-        period_map = {p.id: p.period.lower().replace(' ', '') for p in periods}  # e.g., {'1': '1st', '2': '2nd'}
-        logger.debug(f"Period map: {period_map}")
+def build_grade_sheet_data(enrollment, subjects, periods, student_grades, status='N/A'):
+    """Assemble the template data for one enrollment from preloaded subjects, periods and grades."""
+    period_map = {p.id: p.period.lower().replace(' ', '') for p in periods}  # e.g., {'1': '1st', '2': '2nd'}
+    grade_data = {
+        'name': f"{enrollment.student.firstName} {enrollment.student.lastName}",
+        'level': enrollment.level.name,
+        'academic_year': enrollment.academic_year.name,
+        's': [],
+        'status': status
+    }
 
-        grade_data = {
-            'name': f"{enrollment.student.firstName} {enrollment.student.lastName}",
-            'level': enrollment.level.name,
-            'academic_year': enrollment.academic_year.name,
-            's': [],
-            'status': determine_pass_fail(student_id, level_id, academic_year_id) if is_yearly else 'N/A'
-        }
+    for subject in subjects:
+        subject_grades = {'sn': subject.subject}
+        scores = student_grades.get(subject.id, {})
+        for period in periods:
+            score = scores.get(period.period)
+            period_key = period_map.get(period.id, period.period.lower().replace(' ', ''))
+            subject_grades[period_key] = str(score) if score is not None else '-'
+        
+        # Calculate averages
+        try:
+            # First semester average (1a): ((1st + 2nd + 3rd) / 3 + 1exam) / 2
+            sem1_grades = [subject_grades[p] for p in ['1st', '2nd', '3rd'] if subject_grades.get(p) != '-']
+            exam1 = subject_grades.get('1exam', '-')
+            if len(sem1_grades) == 3 and exam1 != '-':
+                sem1_period_avg = sum(int(g) for g in sem1_grades) // 3
+                subject_grades['1a'] = str((sem1_period_avg + int(exam1)) // 2)
+            else:
+                subject_grades['1a'] = '-'
+                logger.debug(f"Skipping 1a for {subject_grades['sn']}: sem1_grades={sem1_grades}, exam1={exam1}")
+
+            # Second semester average (2a): ((4th + 5th + 6th) / 3 + 2exam) / 2
+            sem2_grades = [subject_grades[p] for p in ['4th', '5th', '6th'] if subject_grades.get(p) != '-']
+            exam2 = subject_grades.get('2exam', '-')
+            if len(sem2_grades) == 3 and exam2 != '-':
+                sem2_period_avg = sum(int(g) for g in sem2_grades) // 3
+                subject_grades['2a'] = str((sem2_period_avg + int(exam2)) // 2)
+            else:
+                subject_grades['2a'] = '-'
+                logger.debug(f"Skipping 2a for {subject_grades['sn']}: sem2_grades={sem2_grades}, exam2={exam2}")
+
+            # Final average (f): (1a + 2a) / 2
+            if subject_grades['1a'] != '-' and subject_grades['2a'] != '-':
+                subject_grades['f'] = str((int(subject_grades['1a']) + int(subject_grades['2a'])) // 2)
+            else:
+                subject_grades['f'] = '-'
+                logger.debug(f"Skipping f for {subject_grades['sn']}: 1a={subject_grades['1a']}, 2a={subject_grades['2a']}")
 
-        for subject in subjects:
-            subject_grades = {'sn': subject.subject}
-            for period in periods:
-                grade = grades.filter(subject=subject, period=period).first()
-                period_key = period_map.get(period.id, period.period.lower().replace(' ', ''))
-                subject_grades[period_key] = str(grade.score) if grade and grade.score is not None else '-'
-            
-            # Calculate averages
-            try:
-                # First semester average (1a): ((1st + 2nd + 3rd) / 3 + 1exam) / 2
-                sem1_grades = [subject_grades[p] for p in ['1st', '2nd', '3rd'] if subject_grades.get(p) != '-']
-                exam1 = subject_grades.get('1exam', '-')
-                if len(sem1_grades) == 3 and exam1 != '-':
-                    sem1_period_avg = sum(int(g) for g in sem1_grades) // 3
-                    subject_grades['1a'] = str((sem1_period_avg + int(exam1)) // 2)
-                else:
-                    subject_grades['1a'] = '-'
-                    logger.debug(f"Skipping 1a for {subject_grades['sn']}: sem1_grades={sem1_grades}, exam1={exam1}")
+            logger.debug(f"Averages for {subject_grades['sn']}: 1a={subject_grades['1a']}, 2a={subject_grades['2a']}, f={subject_grades['f']}")
+        except (ValueError, TypeError) as e:
+            logger.error(f"Error calculating averages for subject {subject_grades['sn']} (student_id={enrollment.student_id}): {str(e)}")
+            subject_grades['1a'] = subject_grades['2a'] = subject_grades['f'] = '-'
 
-                # Second semester average (2a): ((4th + 5th + 6th) / 3 + 2exam) / 2
-                sem2_grades = [subject_grades[p] for p in ['4th', '5th', '6th'] if subject_grades.get(p) != '-']
-                exam2 = subject_grades.get('2exam', '-')
-                if len(sem2_grades) == 3 and exam2 != '-':
-                    sem2_period_avg = sum(int(g) for g in sem2_grades) // 3
-                    subject_grades['2a'] = str((sem2_period_avg + int(exam2)) // 2)
-                else:
-                    subject_grades['2a'] = '-'
-                    logger.debug(f"Skipping 2a for {subject_grades['sn']}: sem2_grades={sem2_grades}, exam2={exam2}")
+        grade_data['s'].append(subject_grades)
 
-                # Final average (f): (1a + 2a) / 2
-                if subject_grades['1a'] != '-' and subject_grades['2a'] != '-':
-                    subject_grades['f'] = str((int(subject_grades['1a']) + int(subject_grades['2a'])) // 2)
-                else:
-                    subject_grades['f'] = '-'
-                    logger.debug(f"Skipping f for {subject_grades['sn']}: 1a={subject_grades['1a']}, 2a={subject_grades['2a']}")
+    # Ensure at least 9 subjects for template
+    while len(grade_data['s']) < 9:
+        grade_data['s'].append({
+            'sn': f"Subject {len(grade_data['s']) + 1}",
+            '1st': '-', '2nd': '-', '3rd': '-', '1exam': '-', '1a': '-',
+            '4th': '-', '5th': '-', '6th': '-', '2exam': '-', '2a': '-', 'f': '-'
+        })
 
-                logger.debug(f"Averages for {subject_grades['sn']}: 1a={subject_grades['1a']}, 2a={subject_grades['2a']}, f={subject_grades['f']}")
-            except (ValueError, TypeError) as e:
-                logger.error(f"Error calculating averages for subject {subject_grades['sn']} (student_id={student_id}): {str(e)}")
-                subject_grades['1a'] = subject_grades['2a'] = subject_grades['f'] = '-'
+    return grade_data
 
-            grade_data['s'].append(subject_grades)
+def get_grade_sheet_data(student_id, level_id, academic_year_id=None, is_yearly=False, grade_pivot=None):
+    """Compile grade data for a student, level, and optional academic year.
 
-        # Ensure at least 9 subjects for template
-        while len(grade_data['s']) < 9:
-            grade_data['s'].append({
-                'sn': f"Subject {len(grade_data['s']) + 1}",
-                '1st': '-', '2nd': '-', '3rd': '-', '1exam': '-', '1a': '-',
-                '4th': '-', '5th': '-', '6th': '-', '2exam': '-', '2a': '-', 'f': '-'
-            })
+    Level-wide callers can pass ``grade_pivot`` (from ``get_grade_pivot``) so the
+    grades for every student are fetched once instead of once per student.
+    """
+    try:
+        enrollment = Enrollment.objects.select_related('student', 'level', 'academic_year').get(
+            student_id=student_id, level_id=level_id, academic_year_id=academic_year_id
+        )
+        if grade_pivot is None:
+            grade_pivot = get_grade_pivot(level_id, enrollment.academic_year_id, student_id=student_id)
+        student_grades = grade_pivot.get(enrollment.student_id, {})
+        subjects = Subject.objects.filter(level_id=level_id)
+        periods = list(Period.objects.all())
+        status = compute_pass_fail(student_id, level_id, enrollment.academic_year_id, grade_pivot) if is_yearly else 'N/A'
+        grade_data = build_grade_sheet_data(enrollment, subjects, periods, student_grades, status)
 
         logger.info(f"Grade sheet data built for student_id={student_id}, level_id={level_id}, academic_year_id={academic_year_id}: {grade_data}")
         return grade_data
@@ -90,4 +104,27 @@ def get_grade_sheet_data(student_id, level_id, academic_year_id=None, is_yearly=
         }
     except Exception as e:
         logger.error(f"Error in get_grade_sheet_data: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+def get_level_grade_sheet_data(level_id, academic_year_id, is_yearly=False):
+    """Compile grade data for every enrollment in a level and academic year.
+
+    Uses a fixed number of queries regardless of roster size. Returns a
+    student_id -> data dict in roster (enrollment) order.
+    """
+    enrollments = Enrollment.objects.filter(
+        level_id=level_id, academic_year_id=academic_year_id
+    ).select_related('student', 'level', 'academic_year').order_by('id')
+    subjects = list(Subject.objects.filter(level_id=level_id))
+    periods = list(Period.objects.all())
+    grade_pivot = get_grade_pivot(level_id, academic_year_id)
+    subject_ids = [subject.id for subject in subjects]
+    evaluate = get_level_evaluator(level_id) if is_yearly else None
+
+    level_data = {}
+    for enrollment in enrollments:
+        student_grades = grade_pivot.get(enrollment.student_id, {})
+        status = evaluate(student_grades, subject_ids) if is_yearly else 'N/A'
+        level_data[enrollment.student_id] = build_grade_sheet_data(enrollment, subjects, periods, student_grades, status)
+    logger.info(f"Grade sheet data built for level_id={level_id}, academic_year_id={academic_year_id}: {len(level_data)} students")
+    return level_data
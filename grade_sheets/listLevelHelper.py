@@ -1,11 +1,11 @@
 from academic_years.models import AcademicYear
 from students.helper import get_students_by_level, format_student_data
-from grades.helper import get_grade_map
+from grades.helper import get_grade_pivot
 from subjects.helper import get_subjects_by_level
 from periods.helpers import get_all_periods
 from enrollment.models import Enrollment
 import logging
-from .utils import determine_pass_fail
+from evaluations.statues_logics import get_level_evaluator
 
 logger = logging.getLogger(__name__)
 
@@ -42,18 +42,20 @@ def build_gradesheet(level_id, academic_year=None):
             raise ValueError("No periods available")
 
         # Build grade_map: student_id -> subject_id -> period_key -> score
-        grade_map = {student.id: {subject_id: {} for subject_id in subjects_by_id} for student in students}
-        period_key_map = {p.id: p.period for p in periods}
-        logger.debug(f"Period key map: {period_key_map}")
-
-        for subject_id in subjects_by_id:
-            for period in periods:
-                period_key = period.period  # e.g., '1st', '2nd', '1exam'
-                grades = get_grade_map(enrollment_ids, subject_id, period.id)
-                logger.debug(f"Grades for subject_id={subject_id}, period={period_key}: {grades}")
-                for student_id, score in grades.items():
-                    if student_id in grade_map:
-                        grade_map[student_id][subject_id][period_key] = score if score is not None else '-'
+        # All grades for the level/year come back in a single query.
+        pivot = get_grade_pivot(level_id, academic_year_obj.id if academic_year_obj else None)
+        grade_map = {
+            student.id: {
+                subject_id: dict(pivot.get(student.id, {}).get(int(subject_id), {}))
+                for subject_id in subjects_by_id
+            }
+            for student in students
+        }
+
+        # Statuses are evaluated in memory for display; persisting them is an explicit
+        # write (see evaluations.statues_logics.persist_level_statuses).
+        subject_ids = [int(subject_id) for subject_id in subjects_by_id]
+        evaluate = get_level_evaluator(level_id)
 
         # Build result
         result = []
@@ -124,7 +126,10 @@ def build_gradesheet(level_id, academic_year=None):
                     subject_data["1a"] = subject_data["2a"] = subject_data["f"] = '-'
 
             student_data["subjects"] = list(subjects_data.values())
-            student_data["status"] = determine_pass_fail(student.id, level_id, academic_year_obj.id if academic_year_obj else None)
+            student_data["status"] = (
+                evaluate(pivot.get(student.id, {}), subject_ids)
+                if academic_year_obj else 'INCOMPLETE'
+            )
             result.append(student_data)
 
         logger.info(f"Gradesheet built for level_id={level_id}, academic_year={academic_year}, students={len(result)}")
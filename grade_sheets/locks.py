@@ -0,0 +1,70 @@
+import logging
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import RenderLock
+
+logger = logging.getLogger(__name__)
+
+
+class RenderInProgress(Exception):
+    """Raised when another request is still rendering the same PDF."""
+
+    def __init__(self, key):
+        super().__init__(f"Rendering in progress for {key}")
+        self.key = key
+
+
+def render_lock_key(kind, level_id, academic_year_id, student_id=None):
+    return f"{kind}:{level_id}:{student_id or 'level'}:{academic_year_id}"
+
+
+def acquire_lock(key, ttl=None):
+    """Try to take the lock for key. Returns an owner token, or None if someone else holds it.
+
+    Locks expire after ttl seconds (PDF_RENDER_LOCK_TTL) so a crashed process
+    cannot block a key forever.
+    """
+    ttl = ttl or getattr(settings, 'PDF_RENDER_LOCK_TTL', 900)
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    # Clear an expired holder first; the unique key makes the insert the actual lock.
+    RenderLock.objects.filter(key=key, expires_at__lt=now).delete()
+    try:
+        with transaction.atomic():
+            RenderLock.objects.create(key=key, owner=token, expires_at=now + timedelta(seconds=ttl))
+    except IntegrityError:
+        return None
+    return token
+
+
+def release_lock(key, token):
+    RenderLock.objects.filter(key=key, owner=token).delete()
+
+
+def single_flight(key, func, wait_timeout=None, poll_interval=0.5):
+    """Run func() while holding the lock for key, so concurrent callers never render twice.
+
+    If another process holds the lock, wait up to wait_timeout seconds
+    (PDF_RENDER_LOCK_WAIT) for it to finish and then run func(), which by then
+    finds the PDF in the content-addressed cache. Raises RenderInProgress if the
+    lock is still held when the wait runs out.
+    """
+    if wait_timeout is None:
+        wait_timeout = getattr(settings, 'PDF_RENDER_LOCK_WAIT', 30)
+    deadline = time.monotonic() + wait_timeout
+    token = acquire_lock(key)
+    if token is None:
+        logger.info(f"Waiting for in-flight render of {key}")
+    while token is None:
+        if time.monotonic() >= deadline:
+            raise RenderInProgress(key)
+        time.sleep(poll_interval)
+        token = acquire_lock(key)
+    try:
+        return func()
+    finally:
+        release_lock(key, token)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from grade_sheets.pdf_storage import collect_pdf_garbage
+
+
+class Command(BaseCommand):
+    help = "Reconcile report card PDF records with storage, delete orphan files and trim the PDF cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int, default=None,
+                            help="Size limit for the PDF store (default: PDF_STORAGE_MAX_BYTES).")
+        parser.add_argument('--grace-seconds', type=int, default=None,
+                            help="Leave files younger than this alone (default: PDF_STORAGE_GRACE_SECONDS).")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be removed without removing it.")
+
+    def handle(self, *args, **options):
+        report = collect_pdf_garbage(
+            max_bytes=options['max_bytes'],
+            grace_seconds=options['grace_seconds'],
+            dry_run=options['dry_run']
+        )
+        verb = "Would reclaim" if options['dry_run'] else "Reclaimed"
+        self.stdout.write(
+            f"{verb} {report['reclaimed_bytes']} bytes: {report['orphan_files']} orphan files, "
+            f"{report['evicted_blobs']} evicted blobs, {report['dangling_rows']} dangling rows. "
+            f"Store now holds {report['total_bytes']} bytes."
+        )
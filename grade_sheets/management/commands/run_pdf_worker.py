@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from grade_sheets.pdf_storage import collect_pdf_garbage
+from grade_sheets.render_jobs import claim_next_job, get_worker_name, requeue_stale_jobs, run_job
+
+# Seconds between checks for jobs abandoned by a crashed worker
+STALE_CHECK_INTERVAL = 30
+
+
+class Command(BaseCommand):
+    help = "Process queued report card render jobs (PDFRenderJob)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default=None,
+                            help="Worker name recorded on claimed jobs (default: hostname:pid).")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty instead of polling.")
+        parser.add_argument('--gc-interval', type=float, default=3600.0,
+                            help="Seconds between PDF garbage collections while idle; 0 disables them.")
+
+    def handle(self, *args, **options):
+        worker_name = options['name'] or get_worker_name()
+        self.stdout.write(f"PDF worker {worker_name} started")
+        last_gc = 0.0
+        last_requeue = 0.0
+
+        while True:
+            close_old_connections()
+            # Jobs of a worker that crashed (this one's previous run or another) go back to the queue
+            if time.monotonic() - last_requeue >= STALE_CHECK_INTERVAL:
+                last_requeue = time.monotonic()
+                requeue_stale_jobs()
+            job = claim_next_job(worker_name)
+            if job is None:
+                if options['once']:
+                    break
+                if options['gc_interval'] and time.monotonic() - last_gc >= options['gc_interval']:
+                    last_gc = time.monotonic()
+                    report = collect_pdf_garbage()
+                    self.stdout.write(f"PDF garbage collection reclaimed {report['reclaimed_bytes']} bytes")
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f"Running render job {job.id} ({job.kind}, level {job.level_id}, student {job.student_id})")
+            job = run_job(job)
+            self.stdout.write(f"Render job {job.id} {job.status.lower()}")
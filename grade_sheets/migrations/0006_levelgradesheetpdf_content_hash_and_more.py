@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grade_sheets', '0005_levelgradesheetpdf_studentgradesheetpdf_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='levelgradesheetpdf',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='levelgradesheetpdf',
+            name='is_yearly',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='studentgradesheetpdf',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='studentgradesheetpdf',
+            name='is_yearly',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='levelgradesheetpdf',
+            name='pdf_path',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='studentgradesheetpdf',
+            name='pdf_path',
+            field=models.CharField(max_length=255),
+        ),
+    ]
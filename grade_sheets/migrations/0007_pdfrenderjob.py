@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_years', '0004_alter_academicyear_name'),
+        ('grade_sheets', '0006_levelgradesheetpdf_content_hash_and_more'),
+        ('levels', '0012_alter_level_options_level_created_at_and_more'),
+        ('students', '0010_student_updated_at_alter_student_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFRenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('periodic', 'Periodic'), ('yearly', 'Yearly')], default='periodic', max_length=10)),
+                ('pass_template', models.BooleanField(default=True)),
+                ('conditional', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=10)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('pdf_path', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academic_years.academicyear')),
+                ('level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='levels.level')),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='students.student')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
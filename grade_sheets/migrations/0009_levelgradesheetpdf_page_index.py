@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grade_sheets', '0008_renderlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='levelgradesheetpdf',
+            name='page_index',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
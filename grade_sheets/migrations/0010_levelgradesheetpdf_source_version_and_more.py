@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grade_sheets', '0009_levelgradesheetpdf_page_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='levelgradesheetpdf',
+            name='source_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentgradesheetpdf',
+            name='source_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
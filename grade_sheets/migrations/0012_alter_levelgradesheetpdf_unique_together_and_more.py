@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:43
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_years', '0004_alter_academicyear_name'),
+        ('grade_sheets', '0011_pdfrenderjob_heartbeat_at'),
+        ('levels', '0012_alter_level_options_level_created_at_and_more'),
+        ('students', '0010_student_updated_at_alter_student_unique_together'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='levelgradesheetpdf',
+            unique_together={('level', 'academic_year', 'is_yearly')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='studentgradesheetpdf',
+            unique_together={('student', 'level', 'academic_year', 'is_yearly')},
+        ),
+    ]
@@ -7,18 +7,22 @@ class StudentGradeSheetPDF(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     level = models.ForeignKey(Level, on_delete=models.CASCADE)
     academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE)
-    pdf_path = models.CharField(max_length=255, unique=True)
+    pdf_path = models.CharField(max_length=255)
     filename = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    is_yearly = models.BooleanField(default=False)
+    # Enrollment.version the PDF was built from
+    source_version = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ('student', 'level', 'academic_year')
+        unique_together = ('student', 'level', 'academic_year', 'is_yearly')
 
     @property
     def view_url(self):
-        from django.conf import settings
-        return f"{settings.MEDIA_URL}{self.pdf_path}"
+        from grade_sheets.pdf_cache import get_media_url
+        return get_media_url(self.pdf_path)
 
     def __str__(self):
         return f"{self.student} - {self.level} - {self.academic_year}"
@@ -26,19 +30,88 @@ class StudentGradeSheetPDF(models.Model):
 class LevelGradeSheetPDF(models.Model):
     level = models.ForeignKey(Level, on_delete=models.CASCADE)
     academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE)
-    pdf_path = models.CharField(max_length=255, unique=True)
+    pdf_path = models.CharField(max_length=255)
     filename = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    is_yearly = models.BooleanField(default=False)
+    # {student_id: {'start': page, 'end': page, 'key': card_cache_key}}, 0-based inclusive pages
+    page_index = models.JSONField(default=dict, blank=True)
+    # LevelDataVersion.version the PDF was built from
+    source_version = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
 
     class Meta:
-        unique_together = ('level', 'academic_year')
+        unique_together = ('level', 'academic_year', 'is_yearly')
 
     @property
     def view_url(self):
-        from django.conf import settings
-        return f"{settings.MEDIA_URL}{self.pdf_path}"
+        from grade_sheets.pdf_cache import get_media_url
+        return get_media_url(self.pdf_path)
 
     def __str__(self):
-        return f"{self.level} - {self.academic_year}"
\ No newline at end of file
+        return f"{self.level} - {self.academic_year}"
+class PDFRenderJob(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    KIND_CHOICES = [
+        ('periodic', 'Periodic'),
+        ('yearly', 'Yearly'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='periodic')
+    level = models.ForeignKey(Level, on_delete=models.CASCADE)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, null=True, blank=True)
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE)
+    pass_template = models.BooleanField(default=True)
+    conditional = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    # Cards skipped because their render failed; included in completed
+    failed = models.PositiveIntegerField(default=0)
+    pdf_path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs; a RUNNING job with an old heartbeat was abandoned
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def eta_seconds(self):
+        """Estimated seconds left, extrapolated from the pace so far."""
+        if self.status != 'RUNNING' or not self.started_at or not self.completed or not self.total:
+            return None
+        from django.utils import timezone
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        return round(elapsed / self.completed * (self.total - self.completed), 1)
+
+    @property
+    def view_url(self):
+        if not self.pdf_path:
+            return None
+        from grade_sheets.pdf_cache import get_media_url
+        return get_media_url(self.pdf_path)
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} - {self.level} - {self.academic_year} ({self.status})"
+
+class RenderLock(models.Model):
+    """Cross-process lock held while a report card PDF is being rendered."""
+    key = models.CharField(max_length=255, unique=True)
+    owner = models.CharField(max_length=64)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key} (until {self.expires_at})"
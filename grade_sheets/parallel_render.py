@@ -0,0 +1,213 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from PyPDF2 import PdfMerger, PdfReader, PdfWriter
+from grade_sheets.pdf_utils import render_template
+from grade_sheets.pdf_converter import convert_docx_bytes
+from grade_sheets.pdf_cache import get_cached_pdf, store_pdf
+from grade_sheets.pdf_optimize import optimize_pdf
+from grade_sheets.direct_pdf import get_report_card_renderer, render_card_pdf
+
+logger = logging.getLogger(__name__)
+
+
+class CardTask:
+    """One student's report card in a level batch."""
+
+    def __init__(self, student_id, template_path, data, cache_key=None):
+        self.student_id = student_id
+        self.template_path = str(template_path)
+        # Grade sheet data built up front by get_level_grade_sheet_data, so workers never query.
+        self.data = data
+        self.cache_key = cache_key
+
+
+def get_render_workers():
+    """Threads filling templates in a level render (PDF_RENDER_WORKERS, default: CPU count)."""
+    return getattr(settings, 'PDF_RENDER_WORKERS', None) or os.cpu_count() or 1
+
+
+def fill_card(task):
+    """Stage 1: fill the template with one student's grade sheet data. Returns DOCX bytes."""
+    if not task.data or 'name' not in task.data:
+        raise ValueError(f"No grade sheet data for student_id={task.student_id}")
+    doc = render_template(task.template_path, task.data)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def render_cards(tasks, max_workers=None, progress_callback=None):
+    """Render report cards for a level in parallel.
+
+    DOCX filling runs in a thread pool (a fill takes milliseconds; the
+    real cost is conversion, which already runs in converter subprocesses);
+    each finished DOCX is handed to a thread pool sized to the converter pool. A failing
+    student is logged and skipped without aborting the batch.
+    progress_callback(finished, total, failed), if given, is called from the
+    calling thread as each card finishes; finished includes the failed cards,
+    so a batch with failures still reaches total.
+
+    Returns (results, failures): results is a list of (student_id, pdf_bytes) in
+    the same order as tasks, failures a list of (student_id, error message).
+    """
+    if get_report_card_renderer() == 'direct':
+        return _render_cards_direct(tasks, progress_callback)
+
+    max_workers = max_workers or get_render_workers()
+    pdfs = [None] * len(tasks)
+    failures = []
+
+    def convert(index, docx_bytes):
+        try:
+            pdfs[index] = convert_docx_bytes(docx_bytes)
+            return True
+        except Exception as e:
+            logger.error(f"Conversion failed for student_id={tasks[index].student_id}: {str(e)}")
+            failures.append((tasks[index].student_id, str(e)))
+            return False
+
+    convert_threads = getattr(settings, 'PDF_CONVERSION_POOL_SIZE', 2)
+    with ThreadPoolExecutor(max_workers=convert_threads) as converter:
+        conversions = []
+        if max_workers <= 1:
+            for index, task in enumerate(tasks):
+                try:
+                    conversions.append(converter.submit(convert, index, fill_card(task)))
+                except Exception as e:
+                    logger.error(f"Fill failed for student_id={task.student_id}: {str(e)}")
+                    failures.append((task.student_id, str(e)))
+        else:
+            # Threads, not forked processes: a fork from a threaded web process can
+            # inherit module locks (compiled templates, converter pool) held mid-call.
+            with ThreadPoolExecutor(max_workers=max_workers) as fillers:
+                fills = {fillers.submit(fill_card, task): index for index, task in enumerate(tasks)}
+                for future in as_completed(fills):
+                    index = fills[future]
+                    try:
+                        conversions.append(converter.submit(convert, index, future.result()))
+                    except Exception as e:
+                        logger.error(f"Fill failed for student_id={tasks[index].student_id}: {str(e)}")
+                        failures.append((tasks[index].student_id, str(e)))
+        # Cards whose fill failed are finished too
+        failed = len(tasks) - len(conversions)
+        if failed and progress_callback:
+            progress_callback(failed, len(tasks), failed)
+        for finished, conversion in enumerate(as_completed(conversions), start=failed + 1):
+            if not conversion.result():
+                failed += 1
+            if progress_callback:
+                progress_callback(finished, len(tasks), failed)
+
+    results = [(task.student_id, pdf) for task, pdf in zip(tasks, pdfs) if pdf is not None]
+    logger.info(f"Rendered {len(results)}/{len(tasks)} cards with {max_workers} workers, {len(failures)} failures")
+    return results, failures
+
+
+def _render_cards_direct(tasks, progress_callback=None):
+    """render_cards for REPORT_CARD_RENDERER='direct': drawing is cheap, so no pools."""
+    results = []
+    failures = []
+    for finished, task in enumerate(tasks, start=1):
+        try:
+            if not task.data or 'name' not in task.data:
+                raise ValueError(f"No grade sheet data for student_id={task.student_id}")
+            results.append((task.student_id, render_card_pdf(task.template_path, task.data)))
+        except Exception as e:
+            logger.error(f"Direct render failed for student_id={task.student_id}: {str(e)}")
+            failures.append((task.student_id, str(e)))
+        if progress_callback:
+            progress_callback(finished, len(tasks), len(failures))
+    logger.info(f"Drew {len(results)}/{len(tasks)} cards directly, {len(failures)} failures")
+    return results, failures
+
+
+def render_cards_cached(tasks, max_workers=None, progress_callback=None):
+    """Like render_cards, but reuse each card's cached PDF and render only the missing ones.
+
+    Every task needs a cache_key (see pdf_cache.card_cache_key). Freshly rendered
+    cards are stored so the next level or student request can reuse them.
+    """
+    cached = {}
+    missing = []
+    for task in tasks:
+        cached_path = get_cached_pdf(task.cache_key)
+        if cached_path:
+            try:
+                with open(cached_path, 'rb') as f:
+                    cached[task.student_id] = f.read()
+                continue
+            except FileNotFoundError:
+                # Evicted between the lookup and the read
+                logger.debug(f"Cached card {task.cache_key} vanished, rendering it again")
+        missing.append(task)
+    logger.info(f"{len(cached)}/{len(tasks)} cards cached, rendering {len(missing)}")
+    if progress_callback:
+        progress_callback(len(cached), len(tasks))
+
+    cached_count = len(cached)
+
+    def report(finished, _, failed=0):
+        # Cached cards count as already finished.
+        progress_callback(cached_count + finished, len(tasks), failed)
+
+    failures = []
+    if missing:
+        rendered, failures = render_cards(missing, max_workers=max_workers, progress_callback=report if progress_callback else None)
+        keys = {task.student_id: task.cache_key for task in missing}
+        for student_id, pdf in rendered:
+            store_pdf(keys[student_id], pdf)
+            cached[student_id] = pdf
+
+    results = [(task.student_id, cached[task.student_id]) for task in tasks if task.student_id in cached]
+    return results, failures
+
+
+def build_page_index(results, card_keys):
+    """Page range of each student's card in the merged PDF, in merge order.
+
+    Returns {str(student_id): {'start': first_page, 'end': last_page, 'key': card_key}}
+    with 0-based, inclusive page numbers (JSON object keys are strings).
+    """
+    page_index = {}
+    page = 0
+    for student_id, pdf in results:
+        page_count = len(PdfReader(io.BytesIO(pdf)).pages)
+        page_index[str(student_id)] = {'start': page, 'end': page + page_count - 1, 'key': card_keys[student_id]}
+        page += page_count
+    return page_index
+
+
+def merge_pdfs(pdf_bytes_list, output_path=None, pad_to_even=False):
+    """Merge PDF byte strings, optionally adding a blank page for duplex printing.
+
+    Cards rendered from the same template embed identical fonts and images; with
+    PDF_OPTIMIZE_MERGED (default on) the merged document shares one copy of each
+    and is written with compressed object streams.
+
+    Writes to output_path and returns it, or returns the merged bytes when no path is given.
+    """
+    merger = PdfMerger()
+    for pdf_bytes in pdf_bytes_list:
+        merger.append(io.BytesIO(pdf_bytes))
+    if pad_to_even and len(pdf_bytes_list) % 2 == 1:
+        last_page = PdfReader(io.BytesIO(pdf_bytes_list[-1])).pages[0]
+        blank = PdfWriter()
+        blank.add_blank_page(width=last_page.mediabox.width, height=last_page.mediabox.height)
+        buffer = io.BytesIO()
+        blank.write(buffer)
+        buffer.seek(0)
+        merger.append(buffer)
+    buffer = io.BytesIO()
+    merger.write(buffer)
+    merger.close()
+    merged = buffer.getvalue()
+    if getattr(settings, 'PDF_OPTIMIZE_MERGED', True):
+        merged = optimize_pdf(merged)
+    if output_path is None:
+        return merged
+    with open(output_path, 'wb') as f:
+        f.write(merged)
+    return output_path
@@ -1,18 +1,25 @@
 import logging
 import os
 from django.conf import settings
-from django.http import FileResponse
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from levels.models import Level
 from academic_years.models import AcademicYear
-from grades.models import Grade
 from levels.helper import get_level_by_id
 from students.helper import get_students_by_level
 from enrollment.models import Enrollment
-from .models import StudentGradeSheetPDF, LevelGradeSheetPDF
+from .models import StudentGradeSheetPDF, LevelGradeSheetPDF, PDFRenderJob
+from .serializers import PDFRenderJobSerializer
+from .helpers import get_grade_sheet_data, get_level_grade_sheet_data
 from .generatePdf import generate_gradesheet_pdf, generate_yearly_gradesheet_pdf
+from .pdf_cache import get_fresh_record, get_pdf_filename, get_source_version, record_pdf
+from .render_jobs import enqueue_render_job
+from .locks import RenderInProgress
+from .pdf_delivery import serve_pdf
+from .zip_export import stream_report_cards_zip
 
 logger = logging.getLogger(__name__)
 
@@ -70,26 +77,20 @@ class GradeSheetViewSet(viewsets.ViewSet):
                     return Response({"error": f"Invalid student_id: {student_id}"}, status=status.HTTP_400_BAD_REQUEST)
                 filter_kwargs['student'] = student
 
-            pdf_query = model.objects.filter(**filter_kwargs)
-            if pdf_query.exists():
-                pdf_record = pdf_query.first()
-                latest_grade = Grade.objects.filter(
-                    enrollment__level_id=level_id,
-                    enrollment__student=student if student_id else None,
-                    enrollment__academic_year=academic_year_obj
-                ).order_by('-updated_at').first()
-                if latest_grade and latest_grade.updated_at > pdf_record.updated_at:
-                    logger.info(f"New grades detected since PDF update at {pdf_record.updated_at}. Regenerating PDF.")
-                    pdf_query.delete()
-                elif os.path.exists(pdf_record.pdf_path):
-                    absolute_url = request.build_absolute_uri(f"{settings.MEDIA_URL}{pdf_record.pdf_path.replace(os.sep, '/')}")
-                    logger.info(f"Returning existing PDF: {absolute_url}")
-                    return Response({
-                        "message": "PDF retrieved successfully",
-                        "view_url": absolute_url,
-                        "pdf_path": pdf_record.pdf_path
-                    })
-
+            # Comparing version counters is enough when nothing changed since the last render
+            source_version = get_source_version(level_id, academic_year_obj.id, student_id)
+            pdf_record = get_fresh_record(model, source_version, is_yearly=False, **filter_kwargs)
+            if pdf_record:
+                absolute_url = request.build_absolute_uri(pdf_record.view_url)
+                logger.info(f"Returning current PDF: {absolute_url}")
+                return Response({
+                    "message": "PDF retrieved successfully",
+                    "view_url": absolute_url,
+                    "pdf_path": pdf_record.pdf_path
+                })
+
+            # PDFs are content-addressed: if the template and grade data are unchanged the
+            # generator returns the stored PDF without rendering anything.
             logger.info(f"Calling generate_gradesheet_pdf with level_id={level_id}, student_id={student_id}, academic_year_id={academic_year_obj.id}")
             pdf_paths = generate_gradesheet_pdf(
                 level_id=int(level_id),
@@ -102,26 +103,27 @@ class GradeSheetViewSet(viewsets.ViewSet):
                 logger.warning(f"No PDFs generated for level_id={level_id}, student_id={student_id}, academic_year_id={academic_year_id}")
                 return Response({"error": f"No PDFs generated for level_id={level_id}, student_id={student_id}, academic_year_id={academic_year_id}"}, status=status.HTTP_400_BAD_REQUEST)
 
-            for pdf_path in pdf_paths:
-                pdf_filename = os.path.basename(pdf_path)
-                relative_pdf_path = os.path.join('output_gradesheets', pdf_filename)
-                absolute_pdf_path = os.path.join(settings.MEDIA_ROOT, relative_pdf_path)
-                model.objects.update_or_create(
-                    **filter_kwargs,
-                    defaults={'pdf_path': absolute_pdf_path, 'filename': pdf_filename}
-                )
-
             pdf_path = pdf_paths[0]
-            pdf_filename = os.path.basename(pdf_path)
-            relative_pdf_path = os.path.join('output_gradesheets', pdf_filename)
-            absolute_url = request.build_absolute_uri(f"{settings.MEDIA_URL}{relative_pdf_path.replace(os.sep, '/')}")
-            logger.info(f"Generated PDF: {absolute_url}")
+            pdf_record, reused = record_pdf(
+                model, pdf_path,
+                get_pdf_filename(level_id, academic_year_obj.id, student_id, is_yearly=False),
+                is_yearly=False, source_version=source_version, **filter_kwargs
+            )
+            absolute_url = request.build_absolute_uri(pdf_record.view_url)
+            logger.info(f"{'Returning existing' if reused else 'Generated'} PDF: {absolute_url}")
             return Response({
-                "message": "PDF generated successfully",
+                "message": "PDF retrieved successfully" if reused else "PDF generated successfully",
                 "view_url": absolute_url,
                 "pdf_path": pdf_path
             })
 
+        except RenderInProgress as e:
+            logger.info(f"{str(e)}; asking client to retry")
+            return Response(
+                {"message": "Rendering in progress, retry shortly", "key": e.key},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': '5'}
+            )
         except AcademicYear.DoesNotExist:
             logger.error(f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}")
             return Response({"error": f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}"}, status=status.HTTP_400_BAD_REQUEST)
@@ -186,26 +188,20 @@ class GradeSheetViewSet(viewsets.ViewSet):
             if student_id:
                 filter_kwargs['student'] = student
 
-            pdf_query = model.objects.filter(**filter_kwargs)
-            if pdf_query.exists():
-                pdf_record = pdf_query.first()
-                latest_grade = Grade.objects.filter(
-                    enrollment__level_id=level_id,
-                    enrollment__student=student if student_id else None,
-                    enrollment__academic_year=academic_year_obj
-                ).order_by('-updated_at').first()
-                if latest_grade and latest_grade.updated_at > pdf_record.updated_at:
-                    logger.info(f"New grades detected since PDF update at {pdf_record.updated_at}. Regenerating PDF.")
-                    pdf_query.delete()
-                elif os.path.exists(pdf_record.pdf_path):
-                    absolute_url = request.build_absolute_uri(f"{settings.MEDIA_URL}{pdf_record.pdf_path.replace(os.sep, '/')}")
-                    logger.info(f"Returning existing PDF: {absolute_url}")
-                    return Response({
-                        "message": "PDF retrieved successfully",
-                        "view_url": absolute_url,
-                        "pdf_path": pdf_record.pdf_path
-                    })
-
+            # Comparing version counters is enough when nothing changed since the last render
+            source_version = get_source_version(level_id, academic_year_obj.id, student_id)
+            pdf_record = get_fresh_record(model, source_version, is_yearly=True, **filter_kwargs)
+            if pdf_record:
+                absolute_url = request.build_absolute_uri(pdf_record.view_url)
+                logger.info(f"Returning current PDF: {absolute_url}")
+                return Response({
+                    "message": "PDF retrieved successfully",
+                    "view_url": absolute_url,
+                    "pdf_path": pdf_record.pdf_path
+                })
+
+            # PDFs are content-addressed: if the template and grade data are unchanged the
+            # generator returns the stored PDF without rendering anything.
             pdf_paths = generate_yearly_gradesheet_pdf(
                 level_id=int(level_id),
                 student_id=int(student_id) if student_id else None,
@@ -218,26 +214,27 @@ class GradeSheetViewSet(viewsets.ViewSet):
                 logger.warning(f"No PDFs generated for level_id={level_id}, student_id={student_id}, academic_year_id={academic_year_id}, pass_template={pass_template}, conditional={conditional}")
                 return Response({"error": f"No PDFs generated for level_id={level_id}, student_id={student_id}, academic_year_id={academic_year_id}"}, status=status.HTTP_400_BAD_REQUEST)
 
-            for pdf_path in pdf_paths:
-                pdf_filename = os.path.basename(pdf_path)
-                relative_pdf_path = os.path.join('output_gradesheets', pdf_filename)
-                absolute_pdf_path = os.path.join(settings.MEDIA_ROOT, relative_pdf_path)
-                model.objects.update_or_create(
-                    **filter_kwargs,
-                    defaults={'pdf_path': absolute_pdf_path, 'filename': pdf_filename}
-                )
-
             pdf_path = pdf_paths[0]
-            pdf_filename = os.path.basename(pdf_path)
-            relative_pdf_path = os.path.join('output_gradesheets', pdf_filename)
-            absolute_url = request.build_absolute_uri(f"{settings.MEDIA_URL}{relative_pdf_path.replace(os.sep, '/')}")
-            logger.info(f"Generated PDF: {absolute_url}")
+            pdf_record, reused = record_pdf(
+                model, pdf_path,
+                get_pdf_filename(level_id, academic_year_obj.id, student_id, is_yearly=True),
+                is_yearly=True, source_version=source_version, **filter_kwargs
+            )
+            absolute_url = request.build_absolute_uri(pdf_record.view_url)
+            logger.info(f"{'Returning existing' if reused else 'Generated'} PDF: {absolute_url}")
             return Response({
-                "message": "PDF generated successfully",
+                "message": "PDF retrieved successfully" if reused else "PDF generated successfully",
                 "view_url": absolute_url,
                 "pdf_path": pdf_path
             })
 
+        except RenderInProgress as e:
+            logger.info(f"{str(e)}; asking client to retry")
+            return Response(
+                {"message": "Rendering in progress, retry shortly", "key": e.key},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': '5'}
+            )
         except AcademicYear.DoesNotExist:
             logger.error(f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}")
             return Response({"error": f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}"}, status=status.HTTP_400_BAD_REQUEST)
@@ -247,13 +244,17 @@ class GradeSheetViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['GET'], url_path='gradesheet/pdf/view')
     def view_gradesheet_pdf(self, request):
-        """GET /api/grade_sheets_pdf/gradesheet/pdf/view/ - Serve PDF (periodic or yearly)."""
+        """GET /api/grade_sheets_pdf/gradesheet/pdf/view/ - Serve PDF (periodic or yearly).
+
+        Supports conditional GET (ETag/Last-Modified) and single byte ranges; see pdf_delivery.
+        """
         level_id = request.query_params.get('level_id')
         student_id = request.query_params.get('student_id')
         academic_year = request.query_params.get('academic_year')
         academic_year_id = request.query_params.get('academic_year_id')
         pass_template = request.query_params.get('pass_template', 'true').lower() == 'true'
         conditional = request.query_params.get('conditional', 'false').lower() == 'true'
+        yearly = request.query_params.get('yearly')
 
         logger.info(f"Received request to view PDF: level_id={level_id}, student_id={student_id}, academic_year={academic_year}, academic_year_id={academic_year_id}")
 
@@ -297,83 +298,234 @@ class GradeSheetViewSet(viewsets.ViewSet):
             if student_id:
                 filter_kwargs['student'] = student
 
-            pdf_query = model.objects.filter(**filter_kwargs)
-            if not pdf_query.exists():
-                logger.warning(f"No PDF record found for level_id={level_id}, student_id={student_id}, academic_year_id={academic_year_id}")
-                return Response({"error": "PDF not found"}, status=status.HTTP_400_BAD_REQUEST)
-
-            pdf_record = pdf_query.first()
-            pdf_path = os.path.join(settings.MEDIA_ROOT, pdf_record.pdf_path)
-            latest_grade = Grade.objects.filter(
-                enrollment__level_id=level_id,
-                enrollment__student=student if student_id else None,
-                enrollment__academic_year=academic_year_obj
-            ).order_by('-updated_at').first()
-
-            if latest_grade and latest_grade.updated_at > pdf_record.updated_at:
-                logger.info(f"New grades detected since PDF update at {pdf_record.updated_at}. Regenerating PDF.")
-                pdf_query.delete()
-                pdf_paths = (
-                    generate_yearly_gradesheet_pdf(
-                        level_id=int(level_id),
-                        student_id=int(student_id) if student_id else None,
-                        pass_template=pass_template,
-                        conditional=conditional,
-                        academic_year_id=academic_year_id
-                    ) if 'yearly' in pdf_record.pdf_path else
-                    generate_gradesheet_pdf(
-                        level_id=int(level_id),
-                        student_id=int(student_id) if student_id else None,
-                        academic_year_id=academic_year_obj.id
-                    )
-                )
-                if not pdf_paths:
-                    return Response({"error": "Failed to re-generate PDF"}, status=status.HTTP_400_BAD_REQUEST)
-                pdf_path = pdf_paths[0]
-                pdf_filename = os.path.basename(pdf_path)
-                relative_pdf_path = os.path.join('output_gradesheets', pdf_filename)
-                absolute_pdf_path = os.path.join(settings.MEDIA_ROOT, relative_pdf_path)
-                model.objects.update_or_create(
-                    **filter_kwargs,
-                    defaults={'pdf_path': absolute_pdf_path, 'filename': pdf_filename}
-                )
-
-            if not os.path.exists(pdf_path):
-                logger.warning(f"PDF file not found: {pdf_path}")
-                pdf_paths = (
-                    generate_yearly_gradesheet_pdf(
-                        level_id=int(level_id),
-                        student_id=int(student_id) if student_id else None,
-                        pass_template=pass_template,
-                        conditional=conditional,
-                        academic_year_id=academic_year_id
-                    ) if 'yearly' in pdf_path else
-                    generate_gradesheet_pdf(
-                        level_id=int(level_id),
-                        student_id=int(student_id) if student_id else None,
-                        academic_year_id=academic_year_obj.id
-                    )
-                )
-                if not pdf_paths:
-                    return Response({"error": "Failed to re-generate PDF"}, status=status.HTTP_400_BAD_REQUEST)
-                pdf_path = pdf_paths[0]
-                pdf_filename = os.path.basename(pdf_path)
-                relative_pdf_path = os.path.join('output_gradesheets', pdf_filename)
-                absolute_pdf_path = os.path.join(settings.MEDIA_ROOT, relative_pdf_path)
-                model.objects.update_or_create(
-                    **filter_kwargs,
-                    defaults={'pdf_path': absolute_pdf_path, 'filename': pdf_filename}
+            if yearly is not None:
+                is_yearly = yearly.lower() == 'true'
+            else:
+                # Without ?yearly= serve the periodic card, or the yearly one if that is all there is
+                kinds = set(model.objects.filter(**filter_kwargs).values_list('is_yearly', flat=True))
+                if not kinds:
+                    logger.warning(f"No PDF record found for level_id={level_id}, student_id={student_id}, academic_year_id={academic_year_id}")
+                    return Response({"error": "PDF not found"}, status=status.HTTP_400_BAD_REQUEST)
+                is_yearly = kinds == {True}
+
+            source_version = get_source_version(level_id, academic_year_obj.id, student_id)
+            fresh_record = get_fresh_record(model, source_version, is_yearly=is_yearly, **filter_kwargs)
+            if fresh_record:
+                return serve_pdf(request, fresh_record.pdf_path, fresh_record.filename)
+
+            # Resolving through the generator is cheap when nothing changed (content-addressed cache hit)
+            # and re-renders only when the grade data or template did.
+            pdf_paths = (
+                generate_yearly_gradesheet_pdf(
+                    level_id=int(level_id),
+                    student_id=int(student_id) if student_id else None,
+                    pass_template=pass_template,
+                    conditional=conditional,
+                    academic_year_id=academic_year_obj.id
+                ) if is_yearly else
+                generate_gradesheet_pdf(
+                    level_id=int(level_id),
+                    student_id=int(student_id) if student_id else None,
+                    academic_year_id=academic_year_obj.id
                 )
+            )
+            if not pdf_paths:
+                return Response({"error": "Failed to re-generate PDF"}, status=status.HTTP_400_BAD_REQUEST)
+            pdf_record, _ = record_pdf(
+                model, pdf_paths[0],
+                get_pdf_filename(level_id, academic_year_obj.id, student_id, is_yearly=is_yearly),
+                is_yearly=is_yearly, source_version=source_version, **filter_kwargs
+            )
+            pdf_path = pdf_record.pdf_path
+            pdf_filename = pdf_record.filename
 
-            with open(pdf_path, 'rb') as f:
-                response = FileResponse(f, content_type='application/pdf')
-                response['Content-Disposition'] = f'inline; filename="{pdf_filename}"'
-                logger.info(f"Serving PDF for viewing: {pdf_path}")
-                return response
+            return serve_pdf(request, pdf_path, pdf_filename)
 
+        except RenderInProgress as e:
+            logger.info(f"{str(e)}; asking client to retry")
+            return Response(
+                {"message": "Rendering in progress, retry shortly", "key": e.key},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': '5'}
+            )
         except AcademicYear.DoesNotExist:
             logger.error(f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}")
             return Response({"error": f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Error serving PDF: {str(e)}", exc_info=True)
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['GET'], url_path='preview')
+    def preview_report_cards(self, request):
+        """GET /api/grade_sheets_pdf/preview/ - Report cards as HTML or JSON, without generating a PDF.
+
+        Shows one student (student_id) or the whole level, in the same layout as
+        the printed card. Pass output=json for the raw card data.
+        """
+        level_id = request.query_params.get('level_id')
+        student_id = request.query_params.get('student_id')
+        academic_year = request.query_params.get('academic_year')
+        academic_year_id = request.query_params.get('academic_year_id')
+        kind = request.query_params.get('kind', 'periodic')
+        output = request.query_params.get('output', 'html')
+
+        logger.info(f"Received report card preview request: kind={kind}, level_id={level_id}, student_id={student_id}, academic_year={academic_year}, academic_year_id={academic_year_id}")
+
+        try:
+            if not level_id or (not academic_year and not academic_year_id):
+                return Response({"error": "level_id and either academic_year or academic_year_id are required"}, status=status.HTTP_400_BAD_REQUEST)
+            if kind not in ('periodic', 'yearly'):
+                return Response({"error": "kind must be 'periodic' or 'yearly'"}, status=status.HTTP_400_BAD_REQUEST)
+            if output not in ('html', 'json'):
+                return Response({"error": "output must be 'html' or 'json'"}, status=status.HTTP_400_BAD_REQUEST)
+
+            level = get_level_by_id(level_id)
+            if not level:
+                return Response({"error": f"Invalid level_id: {level_id}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                academic_year_obj = (
+                    AcademicYear.objects.get(name=academic_year) if academic_year else
+                    AcademicYear.objects.get(id=academic_year_id)
+                )
+            except AcademicYear.DoesNotExist:
+                return Response({"error": f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            is_yearly = kind == 'yearly'
+            # Same data the PDF generators fill into the templates
+            if student_id:
+                if not str(student_id).isdigit() or not Enrollment.objects.filter(
+                    student_id=student_id, level_id=level.id, academic_year=academic_year_obj
+                ).exists():
+                    return Response({"error": f"Invalid student_id: {student_id}"}, status=status.HTTP_400_BAD_REQUEST)
+                # Only this student's grades, not the whole level's
+                student_data = get_grade_sheet_data(int(student_id), level.id, academic_year_obj.id, is_yearly=is_yearly)
+                if not student_data:
+                    return Response({"error": f"No grade data for student_id={student_id}"}, status=status.HTTP_400_BAD_REQUEST)
+                level_data = {int(student_id): student_data}
+            else:
+                # Built in a fixed number of queries
+                level_data = get_level_grade_sheet_data(level_id, academic_year_obj.id, is_yearly=is_yearly)
+            cards = [{'student_id': sid, **data} for sid, data in level_data.items()]
+
+            if output == 'json':
+                return Response({
+                    "kind": kind,
+                    "level_id": level.id,
+                    "academic_year": academic_year_obj.name,
+                    "cards": cards
+                })
+            return render(request, 'grade_sheets/report_card_preview.html', {
+                'cards': cards,
+                'kind': kind,
+                'level_name': level.name,
+                'academic_year': academic_year_obj.name
+            })
+
+        except Exception as e:
+            logger.error(f"Error building report card preview: {str(e)}", exc_info=True)
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['POST'], url_path='jobs')
+    def create_render_job(self, request):
+        """POST /api/grade_sheets_pdf/jobs/ - Queue a periodic or yearly render; returns 202 with the job id."""
+        level_id = request.data.get('level_id')
+        student_id = request.data.get('student_id')
+        academic_year = request.data.get('academic_year')
+        academic_year_id = request.data.get('academic_year_id')
+        kind = request.data.get('kind', 'periodic')
+        pass_template = str(request.data.get('pass_template', 'true')).lower() == 'true'
+        conditional = str(request.data.get('conditional', 'false')).lower() == 'true'
+
+        logger.info(f"Received render job request: kind={kind}, level_id={level_id}, student_id={student_id}, academic_year={academic_year}, academic_year_id={academic_year_id}")
+
+        try:
+            if not level_id or (not academic_year and not academic_year_id):
+                return Response({"error": "level_id and either academic_year or academic_year_id are required"}, status=status.HTTP_400_BAD_REQUEST)
+            if kind not in ('periodic', 'yearly'):
+                return Response({"error": "kind must be 'periodic' or 'yearly'"}, status=status.HTTP_400_BAD_REQUEST)
+
+            if not get_level_by_id(level_id):
+                return Response({"error": f"Invalid level_id: {level_id}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                academic_year_obj = (
+                    AcademicYear.objects.get(name=academic_year) if academic_year else
+                    AcademicYear.objects.get(id=academic_year_id)
+                )
+            except AcademicYear.DoesNotExist:
+                return Response({"error": f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            if student_id and not get_students_by_level(level_id).filter(id=student_id).exists():
+                return Response({"error": f"Invalid student_id: {student_id}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            job = enqueue_render_job(
+                kind,
+                level_id=int(level_id),
+                academic_year_id=academic_year_obj.id,
+                student_id=int(student_id) if student_id else None,
+                pass_template=pass_template,
+                conditional=conditional
+            )
+            return Response({
+                "message": "Render job queued",
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": request.build_absolute_uri(f"{request.path.rstrip('/')}/{job.id}/")
+            }, status=status.HTTP_202_ACCEPTED)
+
+        except Exception as e:
+            logger.error(f"Error queueing render job: {str(e)}", exc_info=True)
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['GET'], url_path=r'jobs/(?P<job_id>\d+)')
+    def render_job_status(self, request, job_id=None):
+        """GET /api/grade_sheets_pdf/jobs/<job_id>/ - Poll a render job's progress, ETA and view_url."""
+        try:
+            job = PDFRenderJob.objects.get(id=job_id)
+        except PDFRenderJob.DoesNotExist:
+            return Response({"error": f"Render job {job_id} not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        data = PDFRenderJobSerializer(job).data
+        if job.view_url:
+            data['view_url'] = request.build_absolute_uri(job.view_url)
+        return Response(data)
+
+    @action(detail=False, methods=['GET'], url_path='zip')
+    def download_report_cards_zip(self, request):
+        """GET /api/grade_sheets_pdf/zip/ - Stream a ZIP of every student's card for a level, or for the whole year."""
+        level_id = request.query_params.get('level_id')
+        academic_year = request.query_params.get('academic_year')
+        academic_year_id = request.query_params.get('academic_year_id')
+        kind = request.query_params.get('kind', 'periodic')
+
+        logger.info(f"Received request for report card ZIP: kind={kind}, level_id={level_id}, academic_year={academic_year}, academic_year_id={academic_year_id}")
+
+        try:
+            if not academic_year and not academic_year_id:
+                return Response({"error": "Either academic_year or academic_year_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+            if kind not in ('periodic', 'yearly'):
+                return Response({"error": "kind must be 'periodic' or 'yearly'"}, status=status.HTTP_400_BAD_REQUEST)
+            if level_id and not get_level_by_id(level_id):
+                return Response({"error": f"Invalid level_id: {level_id}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                academic_year_obj = (
+                    AcademicYear.objects.get(name=academic_year) if academic_year else
+                    AcademicYear.objects.get(id=academic_year_id)
+                )
+            except AcademicYear.DoesNotExist:
+                return Response({"error": f"Invalid academic year or ID: academic_year={academic_year}, academic_year_id={academic_year_id}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            scope = f"level_{level_id}" if level_id else "all_levels"
+            zip_filename = f"{kind}_report_cards_{scope}_{academic_year_obj.name.replace('/', '-')}.zip"
+            response = StreamingHttpResponse(
+                stream_report_cards_zip(academic_year_obj.id, int(level_id) if level_id else None, is_yearly=kind == 'yearly'),
+                content_type='application/zip'
+            )
+            response['Content-Disposition'] = f'attachment; filename="{zip_filename}"'
+            return response
+
+        except Exception as e:
+            logger.error(f"Error streaming report card ZIP: {str(e)}", exc_info=True)
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,195 @@
+import hashlib
+import io
+import json
+import logging
+import os
+from django.conf import settings
+from PyPDF2 import PdfReader, PdfWriter
+from grade_sheets.pdf_utils import get_compiled_template
+from grade_sheets.pdf_storage import get_pdf_storage
+from grade_sheets.direct_pdf import LAYOUT_VERSION, get_layout_name, get_report_card_renderer
+
+logger = logging.getLogger(__name__)
+
+
+def get_blob_dir():
+    """Directory holding content-addressed PDFs (MEDIA_ROOT/output_gradesheets/blobs by default)."""
+    return get_pdf_storage().root
+
+
+def card_cache_key(template_path, data):
+    """Hash of the template file contents plus the exact data dict used to fill it.
+
+    The conversion backend is part of the key, since different backends produce
+    different bytes for the same document. Cards drawn by the direct renderer
+    key on its layout instead of the template contents.
+    """
+    digest = hashlib.sha256()
+    if get_report_card_renderer() == 'direct':
+        digest.update(f"direct:{LAYOUT_VERSION}:{get_layout_name(template_path)}".encode())
+    else:
+        digest.update(get_compiled_template(template_path).digest.encode())
+        digest.update(getattr(settings, 'PDF_CONVERSION_BACKEND', 'libreoffice').encode())
+    digest.update(json.dumps(data, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def combine_cache_keys(keys, *extra):
+    """Key for a document assembled from other cached documents, in order."""
+    digest = hashlib.sha256()
+    for part in (*extra, *keys):
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def blob_path(key):
+    return get_pdf_storage().path(key)
+
+
+def get_cached_pdf(key):
+    """Return the blob path for key if it has already been rendered, else None.
+
+    A hit refreshes the blob's mtime, which collect_pdf_garbage evicts by.
+    """
+    storage = get_pdf_storage()
+    return storage.path(key) if storage.touch(key) else None
+
+
+def store_pdf(key, pdf_bytes):
+    """Store PDF bytes under key and return the blob path."""
+    path = get_pdf_storage().save(key, lambda f: f.write(pdf_bytes))
+    logger.debug(f"Stored PDF blob {path}")
+    return path
+
+
+def store_uncached_pdf(pdf_bytes):
+    """Store PDF bytes that have no cache key under the hash of the bytes themselves.
+
+    No card lookup computes that key, so the blob is never reused; it lives
+    as long as a record points at it. Returns the blob path.
+    """
+    return store_pdf(hashlib.sha256(pdf_bytes).hexdigest(), pdf_bytes)
+
+
+def get_content_hash(pdf_path):
+    """Cache key of a blob path (its file name without extension)."""
+    return os.path.splitext(os.path.basename(pdf_path))[0]
+
+
+def get_media_url(pdf_path):
+    """MEDIA_URL-relative URL of a file stored under MEDIA_ROOT."""
+    relative_path = os.path.relpath(pdf_path, settings.MEDIA_ROOT)
+    return f"{settings.MEDIA_URL}{relative_path.replace(os.sep, '/')}"
+
+
+def record_pdf(model, pdf_path, filename, is_yearly=False, source_version=None, **filter_kwargs):
+    """Point the StudentGradeSheetPDF/LevelGradeSheetPDF record at a blob.
+
+    Level records also pick up the blob's student page index. source_version is
+    the data version read before rendering (see get_fresh_record).
+
+    Returns (record, reused) where reused is True when the record already held
+    the same content.
+    """
+    content_hash = get_content_hash(pdf_path)
+    # Periodic and yearly PDFs of the same student/level are separate records
+    filter_kwargs['is_yearly'] = is_yearly
+    record = model.objects.filter(**filter_kwargs).first()
+    reused = bool(record and record.content_hash == content_hash)
+    defaults = {
+        'pdf_path': pdf_path,
+        'filename': filename,
+        'content_hash': content_hash,
+        'source_version': source_version,
+    }
+    if 'student' not in filter_kwargs and 'student_id' not in filter_kwargs:
+        defaults['page_index'] = load_page_index(pdf_path)
+    record, _ = model.objects.update_or_create(**filter_kwargs, defaults=defaults)
+    return record, reused
+
+
+def get_templates_mtime():
+    """Latest modification time of the report card templates."""
+    template_dir = os.path.join(settings.MEDIA_ROOT, 'templates')
+    if not os.path.isdir(template_dir):
+        return 0
+    with os.scandir(template_dir) as entries:
+        return max((entry.stat().st_mtime for entry in entries if entry.is_file()), default=0)
+
+
+def get_source_version(level_id, academic_year_id, student_id=None):
+    """Data version a student's (enrollment) or a level's PDF is built from."""
+    from enrollment.versioning import get_enrollment_version, get_level_version
+
+    if student_id:
+        return get_enrollment_version(student_id, level_id, academic_year_id)
+    return get_level_version(level_id, academic_year_id)
+
+
+def get_fresh_record(model, source_version, is_yearly=False, **filter_kwargs):
+    """The record if its PDF was built from source_version of the data, else None.
+
+    Comparing version counters lets an unchanged PDF be served without building
+    grade data or cache keys. An edited template also makes the record stale.
+    """
+    if source_version is None:
+        return None
+    record = model.objects.filter(**filter_kwargs, is_yearly=is_yearly, source_version=source_version).first()
+    if not record or not os.path.exists(record.pdf_path):
+        return None
+    if get_templates_mtime() > record.updated_at.timestamp():
+        return None
+    return record
+
+
+def get_pdf_filename(level_id, academic_year_id, student_id=None, is_yearly=False):
+    """Download name for a report card PDF; blobs themselves are named by hash."""
+    kind = 'yearly' if is_yearly else 'periodic'
+    if student_id:
+        return f"{kind}_report_card_{student_id}_{level_id}_{academic_year_id}.pdf"
+    return f"{kind}_level_{level_id}_{academic_year_id}.pdf"
+
+
+def index_path(key):
+    return get_pdf_storage().path(key, '.json')
+
+
+def store_page_index(key, page_index):
+    """Store a merged PDF's student -> page range index next to its blob."""
+    return get_pdf_storage().save(key, lambda f: json.dump(page_index, f), suffix='.json', mode='w')
+
+
+def load_page_index(pdf_path):
+    """Page index stored for a merged blob, or {} when it has none."""
+    path = index_path(get_content_hash(pdf_path))
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def extract_card_from_level(card_key, student_id, level_id, academic_year_id, is_yearly=False):
+    """Cut a student's card out of the current level PDF instead of rendering it.
+
+    Only used when the level PDF's page index says that student's pages were
+    built from exactly this card key. The extracted card is stored under
+    card_key and its blob path returned; returns None when no match exists.
+    """
+    from .models import LevelGradeSheetPDF
+
+    record = LevelGradeSheetPDF.objects.filter(
+        level_id=level_id, academic_year_id=academic_year_id, is_yearly=is_yearly
+    ).only('pdf_path', 'page_index').first()
+    entry = record.page_index.get(str(student_id)) if record and record.page_index else None
+    if not entry or entry.get('key') != card_key or not os.path.exists(record.pdf_path):
+        return None
+
+    reader = PdfReader(record.pdf_path)
+    writer = PdfWriter()
+    for page_number in range(entry['start'], entry['end'] + 1):
+        writer.add_page(reader.pages[page_number])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    logger.info(f"Extracted pages {entry['start']}-{entry['end']} for student_id={student_id} from {record.pdf_path}")
+    return store_pdf(card_key, buffer.getvalue())
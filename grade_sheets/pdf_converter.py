@@ -0,0 +1,204 @@
+import atexit
+import io
+import logging
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionError(Exception):
+    """Raised when a DOCX document cannot be converted to PDF."""
+
+
+def _free_port():
+    """Ask the OS for an unused local TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Docx2PdfBackend:
+    """Microsoft Word automation through docx2pdf. Windows hosts with Word only."""
+
+    def convert(self, docx_bytes, timeout=None):
+        import pythoncom
+        from docx2pdf import convert
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            docx_path = os.path.join(tmp_dir, 'document.docx')
+            pdf_path = os.path.join(tmp_dir, 'document.pdf')
+            with open(docx_path, 'wb') as f:
+                f.write(docx_bytes)
+            pythoncom.CoInitialize()
+            try:
+                convert(docx_path, pdf_path)
+            finally:
+                pythoncom.CoUninitialize()
+            if not os.path.exists(pdf_path):
+                raise ConversionError("docx2pdf did not produce a PDF")
+            with open(pdf_path, 'rb') as f:
+                return f.read()
+
+    def health_check(self):
+        return [{'worker': 'docx2pdf', 'healthy': True}]
+
+    def shutdown(self):
+        pass
+
+
+class LibreOfficeWorker:
+    """One warm headless LibreOffice instance, driven through unoserver/unoconvert."""
+
+    def __init__(self, index, startup_timeout=30):
+        self.index = index
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.port = None
+        self.profile_dir = None
+
+    def start(self):
+        self.port = _free_port()
+        uno_port = _free_port()
+        # Each instance needs its own profile or LibreOffice refuses to start a second copy.
+        self.profile_dir = tempfile.mkdtemp(prefix=f'lo_worker_{self.index}_')
+        command = [
+            getattr(settings, 'UNOSERVER_COMMAND', 'unoserver'),
+            '--interface', '127.0.0.1',
+            '--port', str(self.port),
+            '--uno-port', str(uno_port),
+            '--user-installation', f'file://{self.profile_dir}',
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.is_healthy():
+                logger.info(f"LibreOffice worker {self.index} ready on port {self.port}")
+                return
+            if self.process.poll() is not None:
+                break
+            time.sleep(0.2)
+        self.stop()
+        raise ConversionError(f"LibreOffice worker {self.index} failed to start")
+
+    def is_healthy(self):
+        if not self.process or self.process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def convert(self, docx_bytes, timeout):
+        command = [
+            getattr(settings, 'UNOCONVERT_COMMAND', 'unoconvert'),
+            '--host', '127.0.0.1',
+            '--port', str(self.port),
+            '--convert-to', 'pdf',
+            '-', '-',
+        ]
+        result = subprocess.run(command, input=docx_bytes, capture_output=True, timeout=timeout)
+        if result.returncode != 0 or not result.stdout.startswith(b'%PDF'):
+            raise ConversionError(f"unoconvert failed on worker {self.index}: {result.stderr.decode(errors='replace').strip()}")
+        return result.stdout
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    def restart(self):
+        if self.process:
+            logger.warning(f"Restarting LibreOffice worker {self.index}")
+        self.stop()
+        self.start()
+
+
+class LibreOfficePool:
+    """A fixed pool of warm LibreOffice workers. Each job takes an idle worker, so
+    concurrent conversions scale with the pool size."""
+
+    def __init__(self, size=None, timeout=None):
+        self.size = size or getattr(settings, 'PDF_CONVERSION_POOL_SIZE', 2)
+        self.timeout = timeout or getattr(settings, 'PDF_CONVERSION_TIMEOUT', 60)
+        self.workers = [LibreOfficeWorker(index) for index in range(self.size)]
+        self._idle = queue.Queue()
+        for worker in self.workers:
+            self._idle.put(worker)
+
+    def convert(self, docx_bytes, timeout=None):
+        timeout = timeout or self.timeout
+        worker = self._idle.get()
+        try:
+            for attempt in (1, 2):
+                try:
+                    if not worker.is_healthy():
+                        worker.restart()
+                    return worker.convert(docx_bytes, timeout)
+                except subprocess.TimeoutExpired:
+                    # A hung instance will not recover on its own.
+                    worker.restart()
+                    raise ConversionError(f"Conversion timed out after {timeout}s on worker {worker.index}")
+                except ConversionError:
+                    if attempt == 2 or worker.is_healthy():
+                        raise
+                    logger.warning(f"LibreOffice worker {worker.index} crashed during conversion, retrying")
+        finally:
+            self._idle.put(worker)
+
+    def health_check(self):
+        return [{'worker': worker.index, 'port': worker.port, 'healthy': worker.is_healthy()} for worker in self.workers]
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+CONVERSION_BACKENDS = {
+    'libreoffice': LibreOfficePool,
+    'docx2pdf': Docx2PdfBackend,
+}
+
+_converter = None
+_converter_lock = threading.Lock()
+
+
+def get_converter():
+    """Return the process-wide converter configured by PDF_CONVERSION_BACKEND."""
+    global _converter
+    with _converter_lock:
+        if _converter is None:
+            backend = getattr(settings, 'PDF_CONVERSION_BACKEND', 'libreoffice')
+            backend_class = CONVERSION_BACKENDS.get(backend) or import_string(backend)
+            _converter = backend_class()
+            atexit.register(_converter.shutdown)
+        return _converter
+
+
+def convert_docx_bytes(docx_bytes, timeout=None):
+    """Convert DOCX bytes to PDF bytes."""
+    return get_converter().convert(docx_bytes, timeout=timeout)
+
+
+def convert_document(doc, timeout=None):
+    """Convert an in-memory python-docx Document to PDF bytes without touching disk."""
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return convert_docx_bytes(buffer.getvalue(), timeout=timeout)
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import re
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+logger = logging.getLogger(__name__)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_etag(pdf_path, stat):
+    """Strong ETag for a PDF. Content-addressed blobs are named by their hash, so reuse it."""
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    if re.fullmatch(r'[0-9a-f]{64}', name):
+        return quote_etag(name)
+    return quote_etag(hashlib.sha256(f"{pdf_path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest())
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match.
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def parse_range(header, size):
+    """Parse a single-range Range header into (start, end) inclusive.
+
+    Returns None when the header is absent or not a single byte range (the
+    caller then serves the whole file), or 'unsatisfiable'.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _iter_file_range(pdf_path, start, length):
+    with open(pdf_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload_response(pdf_path, mode):
+    response = HttpResponse(content_type='application/pdf')
+    if mode == 'x-accel':
+        prefix = getattr(settings, 'PDF_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        relative_path = os.path.relpath(pdf_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{relative_path}"
+    else:
+        response['X-Sendfile'] = os.path.abspath(pdf_path)
+    return response
+
+
+def serve_pdf(request, pdf_path, filename, disposition='inline'):
+    """Serve a PDF with conditional GET, single byte ranges and optional web-server offload.
+
+    PDF_DELIVERY_MODE selects who sends the bytes: 'django' (default) streams
+    from this process; 'x-accel' (nginx) and 'x-sendfile' (Apache/lighttpd)
+    return only headers and let the front server stream the file, including
+    any Range handling.
+    """
+    stat = os.stat(pdf_path)
+    etag = get_etag(pdf_path, stat)
+    last_modified = http_date(stat.st_mtime)
+
+    def with_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    if_none_match = request.headers.get('If-None-Match')
+    if etag_matches(if_none_match, etag):
+        return with_headers(HttpResponseNotModified())
+    if not if_none_match:
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if if_modified_since and int(stat.st_mtime) <= if_modified_since:
+            return with_headers(HttpResponseNotModified())
+
+    disposition_header = f'{disposition}; filename="{filename}"'
+    mode = getattr(settings, 'PDF_DELIVERY_MODE', 'django')
+    if mode in ('x-accel', 'x-sendfile'):
+        response = _offload_response(pdf_path, mode)
+        response['Content-Disposition'] = disposition_header
+        logger.info(f"Offloading PDF delivery ({mode}): {pdf_path}")
+        return with_headers(response)
+
+    byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range.strip() not in (etag, last_modified):
+        # The client's partial copy is stale: send the whole file.
+        byte_range = None
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{stat.st_size}"
+        return with_headers(response)
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_iter_file_range(pdf_path, start, length), status=206, content_type='application/pdf')
+        response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+        response['Content-Length'] = str(length)
+    else:
+        # FileResponse closes the file once the body has been sent.
+        response = FileResponse(open(pdf_path, 'rb'), content_type='application/pdf')
+        response['Content-Length'] = str(stat.st_size)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = disposition_header
+    logger.info(f"Serving PDF for viewing: {pdf_path} ({response.status_code})")
+    return with_headers(response)
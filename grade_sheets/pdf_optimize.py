@@ -0,0 +1,192 @@
+import hashlib
+import io
+import logging
+import struct
+import zlib
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+logger = logging.getLogger(__name__)
+
+# Non-stream objects packed per object stream
+OBJECTS_PER_STREAM = 200
+
+# Page tree nodes point back at their parent, so two identical ones must stay distinct
+_UNIQUE_TYPES = ('/Page', '/Pages')
+
+
+def _references(obj):
+    """Yield every IndirectObject nested in obj."""
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, IndirectObject):
+            yield current
+        elif isinstance(current, DictionaryObject):
+            stack.extend(current.values())
+        elif isinstance(current, ArrayObject):
+            stack.extend(current)
+
+
+def _remap(obj, mapping, seen=None):
+    """Replace nested references in place using mapping: (idnum, generation) -> IndirectObject.
+
+    Pass the same seen set across calls when renumbering, so a container shared
+    by two objects is not remapped twice.
+    """
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if seen is not None:
+            if id(current) in seen:
+                continue
+            seen.add(id(current))
+        if isinstance(current, DictionaryObject):
+            items = list(current.items())
+        elif isinstance(current, ArrayObject):
+            items = list(enumerate(current))
+        else:
+            continue
+        for key, value in items:
+            if isinstance(value, IndirectObject):
+                target = mapping.get((value.idnum, value.generation))
+                if target is not None:
+                    current[key] = target
+            else:
+                stack.append(value)
+
+
+def _serialize(obj):
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer, None)
+    return buffer.getvalue()
+
+
+def _collect_objects(reader, roots):
+    """Every object reachable from roots, keyed by (idnum, generation), in discovery order."""
+    objects = {}
+    stack = list(roots)
+    while stack:
+        ref = stack.pop()
+        key = (ref.idnum, ref.generation)
+        if key in objects:
+            continue
+        obj = reader.get_object(ref)
+        if obj is None:
+            continue
+        objects[key] = obj
+        stack.extend(_references(obj))
+    return objects
+
+
+def _dedupe(objects):
+    """Point every reference at one copy of each identical object, until nothing more collapses.
+
+    Leaf objects (font files, images) collapse first; the dictionaries that
+    referenced them then become identical and collapse on the next pass.
+    Returns the number of objects removed.
+    """
+    removed = 0
+    while True:
+        canonical = {}
+        mapping = {}
+        for key, obj in objects.items():
+            if isinstance(obj, DictionaryObject) and obj.get('/Type') in _UNIQUE_TYPES:
+                continue
+            digest = hashlib.sha256(_serialize(obj)).digest()
+            if digest in canonical:
+                mapping[key] = IndirectObject(*canonical[digest], None)
+            else:
+                canonical[digest] = key
+        if not mapping:
+            return removed
+        for key in mapping:
+            del objects[key]
+        for obj in objects.values():
+            _remap(obj, mapping)
+        removed += len(mapping)
+
+
+def _write(objects, root_ref, info_ref):
+    """Write objects as PDF 1.5: streams as plain objects, everything else in compressed object streams."""
+    numbers = {key: number for number, key in enumerate(objects, start=1)}
+    mapping = {key: IndirectObject(number, 0, None) for key, number in numbers.items()}
+    seen = set()
+    for obj in objects.values():
+        _remap(obj, mapping, seen)
+
+    output = io.BytesIO()
+    output.write(b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n')
+    # xref entries: number -> (type, field2, field3)
+    entries = {}
+    packed = []
+    for key, obj in objects.items():
+        number = numbers[key]
+        if isinstance(obj, StreamObject):
+            if '/Filter' not in obj:
+                obj = obj.flate_encode()
+            entries[number] = (1, output.tell(), 0)
+            output.write(b'%d 0 obj\n' % number)
+            obj.write_to_stream(output, None)
+            output.write(b'\nendobj\n')
+        else:
+            packed.append((number, _serialize(obj)))
+
+    next_number = len(objects) + 1
+    for start in range(0, len(packed), OBJECTS_PER_STREAM):
+        chunk = packed[start:start + OBJECTS_PER_STREAM]
+        offsets = []
+        body = io.BytesIO()
+        for index, (number, data) in enumerate(chunk):
+            offsets.append(b'%d %d' % (number, body.tell()))
+            body.write(data + b'\n')
+            entries[number] = (2, next_number, index)
+        header = b' '.join(offsets) + b'\n'
+        data = zlib.compress(header + body.getvalue())
+        entries[next_number] = (1, output.tell(), 0)
+        output.write(b'%d 0 obj\n<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n'
+                     % (next_number, len(chunk), len(header), len(data)))
+        output.write(data + b'\nendstream\nendobj\n')
+        next_number += 1
+
+    # Cross-reference stream (required once objects live in object streams)
+    xref_number = next_number
+    xref_offset = output.tell()
+    entries[xref_number] = (1, xref_offset, 0)
+    rows = [struct.pack('>BIH', 0, 0, 65535)]
+    rows.extend(struct.pack('>BIH', *entries[number]) for number in range(1, xref_number + 1))
+    data = zlib.compress(b''.join(rows))
+    trailer = b'/Root %d 0 R' % numbers[root_ref]
+    if info_ref is not None:
+        trailer += b' /Info %d 0 R' % numbers[info_ref]
+    output.write(b'%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] %s /Filter /FlateDecode /Length %d >>\nstream\n'
+                 % (xref_number, xref_number + 1, trailer, len(data)))
+    output.write(data + b'\nendstream\nendobj\n')
+    output.write(b'startxref\n%d\n%%%%EOF\n' % xref_offset)
+    return output.getvalue()
+
+
+def optimize_pdf(pdf_bytes):
+    """Shrink a merged PDF: share identical fonts, images and other objects
+    between pages, drop unreachable objects, and pack the rest into
+    compressed object streams.
+
+    Returns the original bytes if the document cannot be optimized.
+    """
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        root_ref = reader.trailer.raw_get('/Root')
+        info_ref = reader.trailer.raw_get('/Info') if '/Info' in reader.trailer else None
+        roots = [ref for ref in (root_ref, info_ref) if isinstance(ref, IndirectObject)]
+        objects = _collect_objects(reader, roots)
+        removed = _dedupe(objects)
+        root_key = (root_ref.idnum, root_ref.generation)
+        info_key = (info_ref.idnum, info_ref.generation) if isinstance(info_ref, IndirectObject) else None
+        if info_key not in objects:
+            info_key = None
+        optimized = _write(objects, root_key, info_key)
+    except Exception as e:
+        logger.warning(f"PDF optimization failed, keeping the merged PDF as is: {str(e)}")
+        return pdf_bytes
+    logger.info(f"Optimized PDF: {len(pdf_bytes)} -> {len(optimized)} bytes, {removed} duplicate objects shared")
+    return optimized if len(optimized) < len(pdf_bytes) else pdf_bytes
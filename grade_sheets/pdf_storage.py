@@ -0,0 +1,224 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted / files checked per query when reconciling records against storage
+GC_BATCH_SIZE = 500
+
+
+class FileSystemPDFStorage:
+    """Content-addressed blobs in a local directory, sharded by the first two hex digits of the key.
+
+    A blob is <key>.pdf, optionally with a <key>.json sidecar (a level PDF's page index).
+    """
+
+    def __init__(self, root=None):
+        self.root = root or getattr(settings, 'PDF_STORAGE_ROOT', None) or os.path.join(
+            settings.MEDIA_ROOT, 'output_gradesheets', 'blobs'
+        )
+
+    def path(self, key, suffix='.pdf'):
+        return os.path.join(self.root, key[:2], f"{key}{suffix}")
+
+    def exists(self, key, suffix='.pdf'):
+        return os.path.exists(self.path(key, suffix))
+
+    def touch(self, key, suffix='.pdf'):
+        """Mark a blob as just used, so eviction drops the least recently used first. False if it is gone."""
+        try:
+            os.utime(self.path(key, suffix))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def save(self, key, write, suffix='.pdf', mode='wb'):
+        """Publish a blob atomically: write(f) fills a temp file that is then renamed into place."""
+        path = self.path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers never see a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def delete(self, key):
+        """Remove a blob and its sidecar. Returns the bytes freed."""
+        freed = 0
+        for suffix in ('.pdf', '.json'):
+            freed += self.remove(self.path(key, suffix))
+        return freed
+
+    def remove(self, path):
+        """Remove one file under the storage root. Returns its size, or 0 if it was already gone."""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def scan(self):
+        """Yield (name, path, size, mtime) for every file in the store, including temp files."""
+        if not os.path.isdir(self.root):
+            return
+        with os.scandir(self.root) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            yield entry.name, entry.path, stat.st_size, stat.st_mtime
+
+
+STORAGE_BACKENDS = {
+    'filesystem': FileSystemPDFStorage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_pdf_storage():
+    """Return the process-wide PDF store configured by PDF_STORAGE_BACKEND."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            backend = getattr(settings, 'PDF_STORAGE_BACKEND', 'filesystem')
+            backend_class = STORAGE_BACKENDS.get(backend) or import_string(backend)
+            _storage = backend_class()
+        return _storage
+
+
+def _referenced_paths():
+    """Absolute paths of every PDF a record or render job points at."""
+    from .models import StudentGradeSheetPDF, LevelGradeSheetPDF, PDFRenderJob
+
+    referenced = set()
+    for model in (StudentGradeSheetPDF, LevelGradeSheetPDF, PDFRenderJob):
+        paths = model.objects.exclude(pdf_path__isnull=True).exclude(pdf_path='').values_list('pdf_path', flat=True)
+        referenced.update(os.path.abspath(path) for path in paths.iterator(chunk_size=GC_BATCH_SIZE))
+    return referenced
+
+
+def _drop_dangling_records(existing, dry_run):
+    """Delete records whose PDF no longer exists, in batches. Returns the number of rows."""
+    from .models import StudentGradeSheetPDF, LevelGradeSheetPDF
+
+    dropped = 0
+    for model in (StudentGradeSheetPDF, LevelGradeSheetPDF):
+        dangling = [
+            record_id for record_id, pdf_path in model.objects.values_list('id', 'pdf_path').iterator(chunk_size=GC_BATCH_SIZE)
+            if os.path.abspath(pdf_path) not in existing and not os.path.exists(pdf_path)
+        ]
+        for start in range(0, len(dangling), GC_BATCH_SIZE):
+            if not dry_run:
+                model.objects.filter(id__in=dangling[start:start + GC_BATCH_SIZE]).delete()
+        if dangling:
+            logger.info(f"{'Would drop' if dry_run else 'Dropped'} {len(dangling)} {model.__name__} rows with missing PDFs")
+        dropped += len(dangling)
+    return dropped
+
+
+def collect_pdf_garbage(max_bytes=None, grace_seconds=None, dry_run=False):
+    """Reconcile PDF records against storage and keep the store under max_bytes.
+
+    - Rows whose PDF file is gone are deleted.
+    - Files under output_gradesheets that no row points at and that are not
+      part of the blob store (e.g. old timestamped PDFs) are deleted, as are
+      leftover temp files and page indexes whose PDF is gone.
+    - Unreferenced blobs are the render cache: if the store exceeds max_bytes
+      (PDF_STORAGE_MAX_BYTES), the least recently used are evicted until it fits.
+      Blobs referenced by a row are never evicted.
+    Files younger than grace_seconds (PDF_STORAGE_GRACE_SECONDS) are left
+    alone, since a render may not have recorded them yet.
+
+    Returns a report dict including reclaimed_bytes.
+    """
+    storage = get_pdf_storage()
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'PDF_STORAGE_MAX_BYTES', None)
+    if grace_seconds is None:
+        grace_seconds = getattr(settings, 'PDF_STORAGE_GRACE_SECONDS', 3600)
+    cutoff = time.time() - grace_seconds
+    referenced = _referenced_paths()
+    report = {'dangling_rows': 0, 'orphan_files': 0, 'evicted_blobs': 0, 'reclaimed_bytes': 0, 'total_bytes': 0, 'dry_run': dry_run}
+
+    def reclaim(path, size):
+        report['reclaimed_bytes'] += size if dry_run else storage.remove(path)
+
+    # One directory scan instead of an exists() call per row
+    blobs = {}
+    sidecars = []
+    existing = set()
+    for name, path, size, mtime in storage.scan():
+        key, suffix = os.path.splitext(name)
+        if suffix == '.pdf':
+            blobs[key] = (os.path.abspath(path), size, mtime)
+            existing.add(os.path.abspath(path))
+        elif suffix == '.json':
+            sidecars.append((key, path, size, mtime))
+        elif mtime < cutoff:
+            # Temp file left behind by an interrupted write
+            reclaim(path, size)
+            report['orphan_files'] += 1
+
+    for key, path, size, mtime in sidecars:
+        if key not in blobs and mtime < cutoff:
+            reclaim(path, size)
+            report['orphan_files'] += 1
+
+    # Files outside the blob store, e.g. PDFs written before content addressing
+    output_dir = os.path.join(settings.MEDIA_ROOT, 'output_gradesheets')
+    storage_root = os.path.abspath(storage.root)
+    for dirpath, dirnames, filenames in os.walk(output_dir):
+        if os.path.abspath(dirpath) == storage_root:
+            dirnames[:] = []
+            continue
+        dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != storage_root]
+        for filename in filenames:
+            path = os.path.abspath(os.path.join(dirpath, filename))
+            stat = os.stat(path)
+            if path in referenced:
+                existing.add(path)
+                report['total_bytes'] += stat.st_size
+            elif stat.st_mtime < cutoff:
+                reclaim(path, stat.st_size)
+                report['orphan_files'] += 1
+
+    report['dangling_rows'] = _drop_dangling_records(existing, dry_run)
+
+    total = sum(size for _, size, _ in blobs.values())
+    if max_bytes and total > max_bytes:
+        evictable = sorted(
+            (mtime, key, size) for key, (path, size, mtime) in blobs.items()
+            if path not in referenced and mtime < cutoff
+        )
+        for mtime, key, size in evictable:
+            if total <= max_bytes:
+                break
+            if dry_run:
+                report['reclaimed_bytes'] += size
+            else:
+                report['reclaimed_bytes'] += storage.delete(key)
+            total -= size
+            report['evicted_blobs'] += 1
+        if total > max_bytes:
+            logger.warning(f"PDF store still holds {total} bytes (limit {max_bytes}); the rest is referenced or too recent")
+    report['total_bytes'] += total
+
+    logger.info(f"PDF garbage collection: {report}")
+    return report
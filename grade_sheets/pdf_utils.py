@@ -1,78 +1,138 @@
+import hashlib
+import io
+import os
+import re
+import threading
 from docx import Document
+from docx.oxml.ns import qn
+from docx.table import _Cell
 import logging
 
 logger = logging.getLogger(__name__)
 
-def replace_placeholders(doc, data):
-    """Replace {{name}} in paragraphs and {{s[i].sn}}, {{s[i][key]}} in tables."""
-    try:
-        # Log document content before replacement
-        logger.info("Document paragraphs before replacement:")
-        for para in doc.paragraphs:
-            logger.info(f"Paragraph: {para.text}")
-        logger.info("Tables before replacement:")
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = [cell.text.strip() for cell in row.cells]
-                logger.info(f"Row: {row_text}")
-
-        # Map template placeholders to data keys
-        period_map = {
-            '"1"': '1st',
-            '"2"': '2nd',
-            '"3"': '3rd',
-            '"1s"': '1exam',
-            '"1a"': '1a',
-            '"4"': '4th',
-            '"5"': '5th',
-            '"6"': '6th',
-            '"2s"': '2exam',
-            '"2a"': '2a',
-            '"f"': 'f'
-        }
-
-        # Replace {{name}} in paragraphs
-        for paragraph in doc.paragraphs:
-            for run in paragraph.runs:
-                if '{{name}}' in run.text:
-                    run.text = run.text.replace('{{name}}', str(data.get('name', '')))
-                    logger.info(f"Replaced {{name}} with {data.get('name', '')} in paragraph")
-
-        # Replace placeholders in tables
+# Map template placeholders to data keys
+PERIOD_MAP = {
+    '"1"': '1st',
+    '"2"': '2nd',
+    '"3"': '3rd',
+    '"1s"': '1exam',
+    '"1a"': '1a',
+    '"4"': '4th',
+    '"5"': '5th',
+    '"6"': '6th',
+    '"2s"': '2exam',
+    '"2a"': '2a',
+    '"f"': 'f'
+}
+MAX_SUBJECTS = 9  # Up to 9 subjects
+NAME_PLACEHOLDER = '{{name}}'
+SUBJECT_PLACEHOLDER_RE = re.compile(r'\{\{s\[(\d+)\](?:\.sn|\[("[^"\]]*")\])\}\}')
+
+
+class CompiledTemplate:
+    """A report card template parsed once.
+
+    Records which paragraph runs hold {{name}} and which table cells hold
+    {{s[i].sn}} / {{s[i][key]}} placeholders, so filling a student's card touches
+    only those locations.
+    """
+
+    def __init__(self, template_bytes, mtime=None):
+        self.template_bytes = template_bytes
+        self.mtime = mtime
+        self.digest = hashlib.sha256(template_bytes).hexdigest()
+        self.name_slots, self.cell_slots = self._compile(Document(io.BytesIO(template_bytes)))
+
+    @staticmethod
+    def _compile(doc):
+        name_slots = []
+        for para_index, paragraph in enumerate(doc.paragraphs):
+            for run_index, run in enumerate(paragraph.runs):
+                if NAME_PLACEHOLDER in run.text:
+                    name_slots.append((para_index, run_index))
+
+        cell_slots = []
+        for table_index, table in enumerate(doc.tables):
+            for tc_index, tc in enumerate(table._tbl.iter(qn('w:tc'))):
+                text = _Cell(tc, table).text
+                placeholders = []
+                for match in SUBJECT_PLACEHOLDER_RE.finditer(text):
+                    subject_index = int(match.group(1))
+                    template_key = match.group(2)
+                    if subject_index >= MAX_SUBJECTS:
+                        continue
+                    if template_key is None:
+                        placeholders.append((match.group(0), subject_index, 'sn'))
+                    elif template_key in PERIOD_MAP:
+                        placeholders.append((match.group(0), subject_index, PERIOD_MAP[template_key]))
+                if placeholders:
+                    cell_slots.append((table_index, tc_index, text, placeholders))
+        return name_slots, cell_slots
+
+    @classmethod
+    def from_document(cls, doc):
+        compiled = cls.__new__(cls)
+        compiled.template_bytes = None
+        compiled.mtime = None
+        compiled.digest = None
+        compiled.name_slots, compiled.cell_slots = cls._compile(doc)
+        return compiled
+
+    def fill(self, doc, data):
+        """Substitute a student's data into doc (which must come from this template) in one pass."""
+        if self.name_slots:
+            name = str(data.get('name', ''))
+            paragraphs = doc.paragraphs
+            for para_index, run_index in self.name_slots:
+                run = paragraphs[para_index].runs[run_index]
+                run.text = run.text.replace(NAME_PLACEHOLDER, name)
+
         subjects = data.get('s', [])
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    cell_text = cell.text.strip()
-                    # Log cell text for debugging
-                    if '{{s' in cell_text:
-                        logger.debug(f"Processing cell: {cell_text}")
-                    for i in range(9):  # Up to 9 subjects
-                        # Replace subject name
-                        sn_placeholder = f'{{{{s[{i}].sn}}}}'
-                        if sn_placeholder in cell_text:
-                            value = subjects[i].get('sn', '-') if i < len(subjects) else '-'
-                            cell.text = cell.text.replace(sn_placeholder, str(value))
-                            logger.info(f"Replaced {sn_placeholder} with {value} in table cell")
-                        # Replace grades
-                        for template_key, db_key in period_map.items():
-                            grade_placeholder = f'{{{{s[{i}][{template_key}]}}}}'
-                            if grade_placeholder in cell_text:
-                                value = subjects[i].get(db_key, '-') if i < len(subjects) else '-'
-                                cell.text = cell.text.replace(grade_placeholder, str(value))
-                                logger.info(f"Replaced {grade_placeholder} with {value} in table cell")
-
-        # Log document content after replacement
-        logger.info("Document paragraphs after replacement:")
-        for para in doc.paragraphs:
-            logger.info(f"Paragraph: {para.text}")
-        logger.info("Tables after replacement:")
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = [cell.text.strip() for cell in row.cells]
-                logger.info(f"Row: {row_text}")
+        tables = doc.tables
+        table_cells = {}
+        for table_index, tc_index, text, placeholders in self.cell_slots:
+            if table_index not in table_cells:
+                table_cells[table_index] = list(tables[table_index]._tbl.iter(qn('w:tc')))
+            for placeholder, subject_index, db_key in placeholders:
+                value = subjects[subject_index].get(db_key, '-') if subject_index < len(subjects) else '-'
+                text = text.replace(placeholder, str(value))
+            _Cell(table_cells[table_index][tc_index], tables[table_index]).text = text
 
+        logger.debug(f"Filled {len(self.name_slots)} name runs and {len(self.cell_slots)} table cells for {data.get('name')}")
         return doc
+
+    def render(self, data):
+        """Return a new Document for this template filled with data."""
+        return self.fill(Document(io.BytesIO(self.template_bytes)), data)
+
+
+_compiled_templates = {}
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_template(template_path):
+    """Return the compiled template for a path, recompiling when the file's mtime changes."""
+    template_path = str(template_path)
+    mtime = os.path.getmtime(template_path)
+    with _compiled_lock:
+        compiled = _compiled_templates.get(template_path)
+        if compiled is None or compiled.mtime != mtime:
+            with open(template_path, 'rb') as f:
+                compiled = CompiledTemplate(f.read(), mtime)
+            _compiled_templates[template_path] = compiled
+            logger.info(f"Compiled template {template_path}: {len(compiled.name_slots)} name runs, {len(compiled.cell_slots)} placeholder cells")
+        return compiled
+
+
+def render_template(template_path, data):
+    """Fill the (cached, compiled) template at template_path with a student's data."""
+    return get_compiled_template(template_path).render(data)
+
+
+def replace_placeholders(doc, data):
+    """Replace {{name}} in paragraphs and {{s[i].sn}}, {{s[i][key]}} in tables."""
+    try:
+        return CompiledTemplate.from_document(doc).fill(doc, data)
     except Exception as e:
         logger.error(f"Error replacing placeholders: {str(e)}")
-        raise
\ No newline at end of file
+        raise
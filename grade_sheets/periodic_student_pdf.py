@@ -1,11 +1,10 @@
-from docx import Document
 import os
 import logging
-from django.conf import settings
 from grade_sheets.helpers import get_grade_sheet_data
-from docx2pdf import convert
-from grade_sheets.pdf_utils import replace_placeholders
-import pythoncom
+from grade_sheets.pdf_utils import render_template
+from grade_sheets.pdf_converter import convert_document
+from grade_sheets.direct_pdf import get_report_card_renderer, render_card_pdf
+from grade_sheets.pdf_cache import card_cache_key, extract_card_from_level, get_cached_pdf, store_pdf
 
 logger = logging.getLogger(__name__)
 
@@ -16,39 +15,29 @@ def generate_student_grade_pdf(template_path, student_id, level_id, academic_yea
             logger.error(f"Template not found: {template_path}")
             raise FileNotFoundError(f"Template not found: {template_path}")
 
-        output_dir = os.path.join(settings.MEDIA_ROOT, 'output_gradesheets')
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
-        os.makedirs(output_dir, exist_ok=True)
-        os.makedirs(temp_dir, exist_ok=True)
-
         # Get student data
         data = get_grade_sheet_data(student_id=student_id, level_id=level_id, academic_year_id=academic_year_id)
         if not data or 'name' not in data:
             logger.warning(f"No data found for student_id={student_id}, level_id={level_id}, academic_year_id={academic_year_id}")
             return []
 
-        doc = Document(template_path)
-        doc = replace_placeholders(doc, data)
-        safe_name = data.get('name', 'student').replace(' ', '_').replace(':', '_').replace('/', '_').replace('\\', '_')
-        temp_filename = f"temp_report_card_{safe_name}_{academic_year_id}.docx"
-        temp_path = os.path.join(temp_dir, temp_filename)
-        doc.save(temp_path)
-        logger.info(f"Saved temporary DOCX: {temp_path}")
+        cache_key = card_cache_key(template_path, data)
+        cached_path = get_cached_pdf(cache_key)
+        if cached_path:
+            logger.info(f"Report card unchanged for student_id={student_id}, reusing {cached_path}")
+            return [cached_path]
+        extracted_path = extract_card_from_level(cache_key, student_id, level_id, academic_year_id)
+        if extracted_path:
+            return [extracted_path]
 
-        # Initialize COM for docx2pdf
-        pythoncom.CoInitialize()
-        try:
-            pdf_filename = temp_filename.replace('.docx', '.pdf')
-            pdf_path = os.path.join(output_dir, pdf_filename)
-            convert(temp_path, pdf_path)
-            if os.path.exists(pdf_path):
-                logger.info(f"PDF generated: {pdf_path}")
-                return [pdf_path]
-            else:
-                logger.error(f"PDF not created at {pdf_path}")
-                return []
-        finally:
-            pythoncom.CoUninitialize()
+        if get_report_card_renderer() == 'direct':
+            pdf_bytes = render_card_pdf(template_path, data)
+        else:
+            # Fill and convert in memory; the cached blob is the only file written
+            pdf_bytes = convert_document(render_template(template_path, data))
+        pdf_path = store_pdf(cache_key, pdf_bytes)
+        logger.info(f"PDF generated: {pdf_path}")
+        return [pdf_path]
 
     except Exception as e:
         logger.error(f"Error generating student grade PDF: {str(e)}")
@@ -0,0 +1,155 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .generatePdf import generate_gradesheet_pdf, generate_yearly_gradesheet_pdf
+from .models import PDFRenderJob, StudentGradeSheetPDF, LevelGradeSheetPDF
+from .pdf_cache import get_pdf_filename, get_source_version, record_pdf
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between progress writes, so a big level does not write once per card
+PROGRESS_WRITE_INTERVAL = 1.0
+
+
+def enqueue_render_job(kind, level_id, academic_year_id, student_id=None, pass_template=True, conditional=False):
+    """Queue a periodic or yearly render for a student or whole level."""
+    job = PDFRenderJob.objects.create(
+        kind=kind,
+        level_id=level_id,
+        academic_year_id=academic_year_id,
+        student_id=student_id,
+        pass_template=pass_template,
+        conditional=conditional,
+        total=1 if student_id else 0,
+    )
+    logger.info(f"Queued {kind} render job {job.id}: level_id={level_id}, student_id={student_id}, academic_year_id={academic_year_id}")
+    return job
+
+
+def get_worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next_job(worker_name):
+    """Atomically move the oldest pending job to RUNNING and return it, or None.
+
+    The conditional UPDATE only succeeds for one worker, so this needs no row
+    locks and works on SQLite.
+    """
+    for job_id in PDFRenderJob.objects.filter(status='PENDING').values_list('id', flat=True)[:5]:
+        now = timezone.now()
+        claimed = PDFRenderJob.objects.filter(id=job_id, status='PENDING').update(
+            status='RUNNING', worker=worker_name, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return PDFRenderJob.objects.get(id=job_id)
+    return None
+
+
+def _beat(job_id, stop, interval):
+    """Refresh a running job's heartbeat every interval seconds until stop is set."""
+    try:
+        while not stop.wait(interval):
+            try:
+                PDFRenderJob.objects.filter(id=job_id, status='RUNNING').update(heartbeat_at=timezone.now())
+            except Exception as e:
+                logger.warning(f"Heartbeat for render job {job_id} failed: {str(e)}")
+    finally:
+        connection.close()
+
+
+def run_job(job):
+    """Render a claimed job, recording progress and the resulting PDF on the job."""
+    last_write = [0.0]
+    # A separate thread, since one card render or a wait on a render lock can outlast the stale window
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_beat, args=(job.id, stop, getattr(settings, 'PDF_RENDER_JOB_HEARTBEAT', 30)), daemon=True
+    )
+    heartbeat.start()
+
+    def report_progress(finished, total, failed=0):
+        # finished counts failed cards too, so a job with failures still reaches total
+        now = time.monotonic()
+        if finished < total and now - last_write[0] < PROGRESS_WRITE_INTERVAL:
+            return
+        last_write[0] = now
+        PDFRenderJob.objects.filter(id=job.id).update(completed=finished, total=total, failed=failed)
+
+    is_yearly = job.kind == 'yearly'
+    # A worker can afford to wait out a concurrent render of the same PDF.
+    lock_wait = getattr(settings, 'PDF_RENDER_LOCK_TTL', 900)
+    try:
+        # Read before rendering, so a write during the render leaves the record stale
+        source_version = get_source_version(job.level_id, job.academic_year_id, job.student_id)
+        if is_yearly:
+            pdf_paths = generate_yearly_gradesheet_pdf(
+                level_id=job.level_id,
+                student_id=job.student_id,
+                pass_template=job.pass_template,
+                conditional=job.conditional,
+                academic_year_id=job.academic_year_id,
+                progress_callback=report_progress,
+                wait_timeout=lock_wait
+            )
+        else:
+            pdf_paths = generate_gradesheet_pdf(
+                level_id=job.level_id,
+                student_id=job.student_id,
+                academic_year_id=job.academic_year_id,
+                progress_callback=report_progress,
+                wait_timeout=lock_wait
+            )
+        if not pdf_paths:
+            raise RuntimeError(f"No PDFs generated for level_id={job.level_id}, student_id={job.student_id}, academic_year_id={job.academic_year_id}")
+
+        filter_kwargs = {'level_id': job.level_id, 'academic_year_id': job.academic_year_id}
+        if job.student_id:
+            filter_kwargs['student_id'] = job.student_id
+        record_pdf(
+            StudentGradeSheetPDF if job.student_id else LevelGradeSheetPDF,
+            pdf_paths[0],
+            get_pdf_filename(job.level_id, job.academic_year_id, job.student_id, is_yearly=is_yearly),
+            is_yearly=is_yearly,
+            source_version=source_version,
+            **filter_kwargs
+        )
+        job.refresh_from_db(fields=['total'])
+        job.status = 'DONE'
+        job.pdf_path = pdf_paths[0]
+        job.completed = job.total
+        logger.info(f"Render job {job.id} finished: {job.pdf_path}")
+    except Exception as e:
+        logger.error(f"Render job {job.id} failed: {str(e)}", exc_info=True)
+        job.refresh_from_db(fields=['total', 'completed'])
+        job.status = 'FAILED'
+        job.error = str(e)
+    finally:
+        stop.set()
+        heartbeat.join()
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'pdf_path', 'completed', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs(stale_after=None):
+    """Return RUNNING jobs whose worker stopped sending heartbeats to the queue.
+
+    Any worker can call this: a crashed worker's jobs are picked up by the next
+    one regardless of its name. stale_after defaults to PDF_RENDER_JOB_STALE_AFTER.
+    """
+    if stale_after is None:
+        stale_after = getattr(settings, 'PDF_RENDER_JOB_STALE_AFTER', 120)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    count = PDFRenderJob.objects.filter(status='RUNNING', heartbeat_at__lt=cutoff).update(
+        status='PENDING', worker='', started_at=None, heartbeat_at=None
+    )
+    if count:
+        logger.warning(f"Requeued {count} render jobs with no heartbeat since {cutoff}")
+    return count
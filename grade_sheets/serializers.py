@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import StudentGradeSheetPDF, LevelGradeSheetPDF
+from .models import StudentGradeSheetPDF, LevelGradeSheetPDF, PDFRenderJob
 
 class StudentGradeSheetSerializer(serializers.ModelSerializer):
     view_url = serializers.ReadOnlyField()
@@ -13,4 +13,12 @@ class LevelGradeSheetSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = LevelGradeSheetPDF
-        fields = ['id', 'level', 'academic_year', 'filename', 'view_url', 'created_at', 'updated_at']
\ No newline at end of file
+        fields = ['id', 'level', 'academic_year', 'filename', 'view_url', 'created_at', 'updated_at']
+class PDFRenderJobSerializer(serializers.ModelSerializer):
+    view_url = serializers.ReadOnlyField()
+    eta_seconds = serializers.ReadOnlyField()
+
+    class Meta:
+        model = PDFRenderJob
+        fields = ['id', 'kind', 'level', 'student', 'academic_year', 'status', 'completed', 'failed', 'total',
+                  'eta_seconds', 'view_url', 'error', 'created_at', 'started_at', 'finished_at']
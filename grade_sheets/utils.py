@@ -1,30 +1,30 @@
-import os
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
+from django.utils import timezone
 from academic_years.models import AcademicYear
 from enrollment.helper import get_enrollment_by_student_level
-from evaluations.statues_logics import determine_pass_fail
+from evaluations.recompute_logics import recompute_statuses
 from grades.models import Grade
 from enrollment.models import Enrollment
 from subjects.models import Subject
 from .models import StudentGradeSheetPDF, LevelGradeSheetPDF
+from .pdf_storage import collect_pdf_garbage
 from pass_and_failed.models import PassFailedStatus
 from pass_and_failed.helper import promote_student_if_eligible
 
 logger = logging.getLogger(__name__)
 
 def cleanup_old_pdfs(days=2):
-    """Delete PDFs older than specified days."""
-    cutoff = datetime.now() - timedelta(days=days)
+    """Forget PDF records older than specified days and collect the files nothing uses any more.
+
+    Blobs are shared between records, so files are never removed per row; the
+    garbage collector decides what can go. Returns its report.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
     for model in [StudentGradeSheetPDF, LevelGradeSheetPDF]:
-        old_pdfs = model.objects.filter(created_at__lt=cutoff)
-        for pdf in old_pdfs:
-            if os.path.exists(pdf.pdf_path):
-                try:
-                    os.remove(pdf.pdf_path)
-                except OSError as e:
-                    logger.warning(f"Error deleting PDF {pdf.pdf_path}: {str(e)}")
-        old_pdfs.delete()
+        deleted, _ = model.objects.filter(created_at__lt=cutoff).delete()
+        logger.info(f"Deleted {deleted} {model.__name__} records older than {days} days")
+    return collect_pdf_garbage()
 
 def update_grades(level_id, subject_id, period_id, grades, academic_year):
     """
@@ -59,7 +59,7 @@ def update_grades(level_id, subject_id, period_id, grades, academic_year):
         updated_grades = []
         skipped_students = []
         errors = []
-        affected_student_ids = []
+        changed_students = set()
 
         for grade_data in grades:
             student_id = grade_data.get('student_id')
@@ -95,19 +95,12 @@ def update_grades(level_id, subject_id, period_id, grades, academic_year):
             grade.score = score
             grade.save()
             updated_grades.append(grade.id)
-            affected_student_ids.append(student_id)
             logger.info(f"Updated grade: id={grade.id}, enrollment_id={enrollment.id}, subject_id={subject_id}, period_id={period_id}, score={score}")
 
-            # Recalculate pass/fail status after grade update
-            determine_pass_fail(student_id, level_id, academic_year_obj.id)
+            # Pass/fail is recalculated once per batch, after the loop
+            changed_students.add(enrollment.student_id)
 
-        if updated_grades:
-            StudentGradeSheetPDF.objects.filter(
-                level_id=level_id,
-                student_id__in=affected_student_ids,
-                academic_year=academic_year_obj
-            ).delete()
-            logger.info(f"Deleted existing PDFs for students {affected_student_ids} due to updated grades.")
+        recompute_statuses(level_id, academic_year_obj.id, changed_students)
 
         response_data = {
             "message": "Grades updated.",
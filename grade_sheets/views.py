@@ -8,7 +8,7 @@ from rest_framework.response import Response
 from enrollment.models import Enrollment
 from students.helper import get_students_by_level, format_student_name
 from levels.helper import get_level_by_id, get_all_levels
-from grades.helper import get_grade_map, save_grade
+from grades.helper import bulk_save_grades
 from subjects.helper import get_subjects_by_level
 from periods.helpers import get_all_periods
 from enrollment.helper import get_enrollment_by_student_level
@@ -46,50 +46,16 @@ class GradeSheetViewSet(viewsets.ViewSet):
         try:
             academic_year_obj = AcademicYear.objects.get(id=academic_year)
          
-            saved_grades = []
-            skipped_students = []
-            errors = []
-            affected_student_ids = []
-
-            for grade_data in grades:
-                student_id = grade_data.get('student_id')
-                score = grade_data.get('score')
-                grade_period_id = grade_data.get('period_id', period_id)
-                if not student_id or score is None or not grade_period_id:
-                    errors.append({"student_id": student_id, "error": "Missing student_id, score, or period_id"})
-                    continue
-
-                try:
-                    score = int(score)
-                    if not (0 <= score <= 100):
-                        errors.append({"student_id": student_id, "error": "Score must be an integer between 0 and 100"})
-                        continue
-                except (ValueError, TypeError):
-                    errors.append({"student_id": student_id, "error": "Score must be an integer"})
-                    continue
-
-                enrollment = get_enrollment_by_student_level(student_id, level_id, academic_year_obj.id)
-                if not enrollment:
-                    logger.warning(f"No enrollment found for student_id={student_id}, level_id={level_id}, academic_year={academic_year}")
-                    skipped_students.append(student_id)
-                    continue
-
-                grade, result = save_grade(enrollment, subject_id, grade_period_id, score, request)
-                if grade:
-                    saved_grades.append(grade.id)
-                    affected_student_ids.append(student_id)
-                    logger.info(f"Saved grade: id={grade.id}, enrollment_id={enrollment.id}, subject_id={subject_id}, period_id={grade_period_id}, score={score}")
-                else:
-                    errors.append({"student_id": student_id, "error": result})
-
-            if saved_grades:
-                from .models import StudentGradeSheetPDF
-                StudentGradeSheetPDF.objects.filter(
-                    level_id=level_id,
-                    student_id__in=affected_student_ids,
-                    academic_year=academic_year_obj
-                ).delete()
-                logger.info(f"Deleted existing PDFs for students {affected_student_ids} due to new/updated grades.")
+            entries = [
+                {
+                    'student_id': grade_data.get('student_id'),
+                    'score': grade_data.get('score'),
+                    'period_id': grade_data.get('period_id', period_id),
+                }
+                for grade_data in grades
+            ]
+            saved, skipped_students, errors = bulk_save_grades(level_id, academic_year_obj.id, subject_id, entries)
+            saved_grades = [grade.id for _, grade in saved]
 
             response_data = {
                 "message": "Grades processed.",
@@ -258,36 +224,13 @@ def input_grades_view(request):
 
         try:
             academic_year_obj = AcademicYear.objects.get(name=academic_year)
-            saved_grades = []
-            skipped_students = []
-            errors = []
-            affected_student_ids = []
-
-            for grade_data in grades:
-                student_id = grade_data['student_id']
-                score = grade_data['score']
-                grade_period_id = period_id
-
-                enrollment = get_enrollment_by_student_level(student_id, level_id, academic_year_obj.id)
-                if not enrollment:
-                    skipped_students.append(student_id)
-                    continue
-
-                grade, result = save_grade(enrollment, subject_id, grade_period_id, score, request)
-                if grade:
-                    saved_grades.append(grade.id)
-                    affected_student_ids.append(student_id)
-                else:
-                    errors.append(f"Student ID {student_id}: {result}")
-
-            if saved_grades:
-                from .models import StudentGradeSheetPDF
-                StudentGradeSheetPDF.objects.filter(
-                    level_id=level_id,
-                    student_id__in=affected_student_ids,
-                    academic_year=academic_year_obj
-                ).delete()
-                logger.info(f"Deleted existing PDFs for students {affected_student_ids} due to new grades.")
+            entries = [
+                {'student_id': grade_data['student_id'], 'score': grade_data['score'], 'period_id': period_id}
+                for grade_data in grades
+            ]
+            saved, skipped_students, grade_errors = bulk_save_grades(level_id, academic_year_obj.id, subject_id, entries)
+            saved_grades = [grade.id for _, grade in saved]
+            errors = [f"Student ID {error['student_id']}: {error['error']}" for error in grade_errors]
 
             if errors:
                 messages.error(request, f"Some grades failed: {', '.join(errors)}")
@@ -1,115 +1,92 @@
 import os
 import logging
-import pythoncom
-from docxtpl import DocxTemplate
-from docx2pdf import convert
-from PyPDF2 import PdfMerger
 from django.conf import settings
-from grade_sheets.helpers import get_grade_sheet_data
 from pass_and_failed.models import PassFailedStatus
-from enrollment.models import Enrollment
-from .models import LevelGradeSheetPDF
-from academic_years.models import AcademicYear
-from datetime import datetime
-from .pdf_utils import replace_placeholders
+from .helpers import get_level_grade_sheet_data
+from .parallel_render import CardTask, render_cards_cached, merge_pdfs, build_page_index
+from .direct_pdf import get_report_card_renderer, render_level_document
+from .pdf_cache import card_cache_key, combine_cache_keys, get_cached_pdf, store_pdf, store_page_index
 
 logger = logging.getLogger(__name__)
 
-def generate_yearly_level_pdf(level_id, academic_year):
-    """Generate a single PDF for all students in a level, with each student on a separate page."""
+def get_yearly_template_path(status):
+    """Pick the yearly card template for a PassFailedStatus value."""
+    template_name = (
+        'yearly_card_conditional.docx' if status == 'CONDITIONAL' else
+        'yearly_card_pass.docx' if status == 'PASS' else
+        'yearly_card_failed.docx'
+    )
+    return os.path.join(settings.MEDIA_ROOT, 'templates', template_name)
+
+def get_yearly_card(data, status):
+    """Template path and card data for a yearly card, both following the stored status.
+
+    The card prints the status that chose its template rather than the one
+    computed with the grade data, so its status line and remark cannot disagree.
+    """
+    return get_yearly_template_path(status), dict(data, status=status or 'N/A')
+
+def generate_yearly_level_pdf(level_id, academic_year_id, pass_template=True, conditional=False, max_workers=None, progress_callback=None):
+    """Generate a single PDF for all students in a level, with each student on a separate page.
+
+    The template for each student follows their PassFailedStatus; pass_template and
+    conditional are accepted for signature compatibility with the student generator.
+    Cards are cached per student, so only students whose inputs changed are rendered.
+    """
     try:
-        output_dir = os.path.join(settings.MEDIA_ROOT, 'output_gradesheets')
-        os.makedirs(output_dir, exist_ok=True)
-
-        enrollments = Enrollment.objects.filter(level_id=level_id, academic_year__name=academic_year)
-        if not enrollments.exists():
-            logger.warning(f"No enrollments found for level_id={level_id}, academic_year={academic_year}")
+        # Build every student's grade sheet data and read statuses in a fixed number of queries
+        level_data = get_level_grade_sheet_data(level_id, academic_year_id, is_yearly=True)
+        if not level_data:
+            logger.warning(f"No enrollments found for level_id={level_id}, academic_year_id={academic_year_id}")
             return []
-
-        merger = PdfMerger()
-        temp_pdf_paths = []
-        for enrollment in enrollments:
-            student_id = enrollment.student.id
-            student_data = get_grade_sheet_data(student_id, level_id, academic_year)
-            if not student_data or 'name' not in student_data:
-                logger.warning(f"No data found for student_id={student_id}")
-                continue
-
-            status_obj = PassFailedStatus.objects.filter(student_id=student_id, level_id=level_id, academic_year__name=academic_year).first()
-            template_path = (
-                os.path.join(settings.MEDIA_ROOT, 'templates', 'yearly_card_conditional.docx') if status_obj and status_obj.status == 'CONDITIONAL' else
-                os.path.join(settings.MEDIA_ROOT, 'templates', 'yearly_card_pass.docx') if status_obj and status_obj.status == 'PASS' else
-                os.path.join(settings.MEDIA_ROOT, 'templates', 'yearly_card_failed.docx')
-            )
-
+        statuses = dict(PassFailedStatus.objects.filter(
+            level_id=level_id, academic_year_id=academic_year_id
+        ).values_list('student_id', 'status'))
+
+        tasks = []
+        card_keys = {}
+        for student_id, data in level_data.items():
+            template_path, data = get_yearly_card(data, statuses.get(student_id))
             if not os.path.exists(template_path):
                 logger.error(f"Template not found: {template_path}")
                 continue
-
-            doc = DocxTemplate(template_path)
-            replace_placeholders(doc, student_data)
-            student_name = student_data['name'].replace(' ', '_').replace(':', '_').replace('/', '_').replace('\\', '_')
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            docx_path = os.path.join(output_dir, f"temp_yearly_card_{student_name}_{timestamp}.docx")
-            temp_pdf_path = os.path.join(output_dir, f"temp_yearly_card_{student_name}_{timestamp}.pdf")
-
-            doc.save(docx_path)
-            logger.info(f"Saved .docx: {docx_path}")
-
-            pythoncom.CoInitialize()
-            try:
-                convert(docx_path, temp_pdf_path)
-                logger.info(f"Converted to PDF: {temp_pdf_path}")
-            finally:
-                pythoncom.CoUninitialize()
-
-            if not os.path.exists(temp_pdf_path):
-                logger.error(f"PDF not created at {temp_pdf_path}")
-                continue
-
-            temp_pdf_paths.append(temp_pdf_path)
-            try:
-                os.remove(docx_path)
-                logger.info(f"Cleaned up .docx: {docx_path}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up .docx: {str(e)}")
-
-        if not temp_pdf_paths:
-            logger.warning(f"No PDFs generated for level_id={level_id}, academic_year={academic_year}")
+            card_keys[student_id] = card_cache_key(template_path, data)
+            tasks.append(CardTask(student_id, template_path, data, card_keys[student_id]))
+
+        level_key = combine_cache_keys(card_keys.values(), 'yearly_level')
+        cached_path = get_cached_pdf(level_key)
+        if cached_path:
+            if progress_callback:
+                progress_callback(len(card_keys), len(card_keys))
+            logger.info(f"Yearly level {level_id} PDF unchanged, reusing {cached_path}")
+            return [cached_path]
+
+        if get_report_card_renderer() == 'direct':
+            # Drawing is cheap: draw the whole level in one pass instead of stitching cached cards
+            pdf_bytes, page_index, failures = render_level_document(tasks, pad_to_even=True, progress_callback=progress_callback)
+            rendered_keys = [entry['key'] for entry in page_index.values()]
+        else:
+            # Re-render only the cards whose inputs changed; failed students are skipped
+            results, failures = render_cards_cached(tasks, max_workers=max_workers, progress_callback=progress_callback)
+            rendered_keys = [card_keys[student_id] for student_id, _ in results]
+            if results:
+                page_index = build_page_index(results, card_keys)
+                pdf_bytes = merge_pdfs([pdf for _, pdf in results], pad_to_even=True)
+        if failures:
+            logger.warning(f"Skipped {len(failures)} students for level {level_id}: {failures}")
+        if not rendered_keys:
+            logger.warning(f"No PDFs generated for level_id={level_id}, academic_year_id={academic_year_id}")
             return []
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        merged_pdf_path = os.path.join(output_dir, f"yearly_cards_level_{level_id}_{timestamp}.pdf")
-        for temp_pdf_path in temp_pdf_paths:
-            merger.append(temp_pdf_path)
-        if len(temp_pdf_paths) % 2 == 1:
-            merger.append(os.path.join(settings.MEDIA_ROOT, 'templates', 'blank_page.pdf'))
-        merger.write(merged_pdf_path)
-        merger.close()
+        # Only students that rendered are part of the stored document's key
+        if failures:
+            level_key = combine_cache_keys(rendered_keys, 'yearly_level')
+        # Record which pages belong to which student, so single cards can be cut out later
+        store_page_index(level_key, page_index)
+        merged_pdf_path = store_pdf(level_key, pdf_bytes)
         logger.info(f"Merged PDFs into: {merged_pdf_path}")
-
-        if not os.path.exists(merged_pdf_path):
-            logger.error(f"Merged PDF not created: {merged_pdf_path}")
-            return []
-
-        LevelGradeSheetPDF.objects.create(
-            level_id=level_id,
-            academic_year=AcademicYear.objects.get(name=academic_year),
-            pdf_path=merged_pdf_path,
-            filename=os.path.basename(merged_pdf_path),
-            created_at=datetime.now(),
-            is_yearly=True  
-        )
-
-        for temp_pdf_path in temp_pdf_paths:
-            try:
-                os.remove(temp_pdf_path)
-                logger.info(f"Cleaned up temp PDF: {temp_pdf_path}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up temp PDF: {str(e)}")
-
         return [merged_pdf_path]
 
     except Exception as e:
         logger.error(f"Error generating yearly level PDF: {str(e)}")
-        return []
\ No newline at end of file
+        return []
@@ -7,7 +7,7 @@ from pass_and_failed.models import PassFailedStatus
 
 logger = logging.getLogger(__name__)
 
-def generate_yearly_pdf(level_id, student_id=None, pass_template=True, conditional=False, academic_year_id=None):
+def generate_yearly_pdf(level_id, student_id=None, pass_template=True, conditional=False, academic_year_id=None, progress_callback=None):
     """
     Generate yearly report card PDFs for a student or level.
     
@@ -17,6 +17,7 @@ def generate_yearly_pdf(level_id, student_id=None, pass_template=True, condition
         pass_template: Use pass template (default True).
         conditional: Use conditional template (default False).
         academic_year_id: ID of the academic year (optional).
+        progress_callback: Called with (finished, total) cards during level renders (optional).
     
     Returns:
         List of PDF paths.
@@ -41,9 +42,9 @@ def generate_yearly_pdf(level_id, student_id=None, pass_template=True, condition
                 conditional = False
 
         if student_id:
-            return generate_yearly_student_pdf(level_id, student_id, academic_year_id, pass_template, conditional)
+            return generate_yearly_student_pdf(student_id, level_id, academic_year_id, pass_template, conditional)
         else:
-            return generate_yearly_level_pdf(level_id, academic_year_id, pass_template, conditional)
+            return generate_yearly_level_pdf(level_id, academic_year_id, pass_template, conditional, progress_callback=progress_callback)
     except Exception as e:
         logger.error(f"Error generating yearly PDF: {str(e)}")
         return []
\ No newline at end of file
@@ -0,0 +1,117 @@
+import logging
+import os
+import re
+import zipfile
+from enrollment.models import Enrollment
+from pass_and_failed.models import PassFailedStatus
+from .generatePdf import get_template_path
+from .helpers import get_level_grade_sheet_data
+from .parallel_render import CardTask, render_cards
+from .pdf_cache import blob_path, card_cache_key, get_cached_pdf, store_pdf
+from .yearly_level_pdf import get_yearly_card
+
+logger = logging.getLogger(__name__)
+
+
+class _StreamBuffer:
+    """Write-only, non-seekable sink for ZipFile; the generator drains it after each entry."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _safe_name(value):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(value)).strip('_') or 'unnamed'
+
+
+def get_level_card_tasks(level_id, academic_year_id, is_yearly=False):
+    """CardTasks (with cache keys) for every student in a level, in roster order."""
+    level_data = get_level_grade_sheet_data(level_id, academic_year_id, is_yearly=is_yearly)
+    statuses = {}
+    if is_yearly:
+        statuses = dict(PassFailedStatus.objects.filter(
+            level_id=level_id, academic_year_id=academic_year_id
+        ).values_list('student_id', 'status'))
+    periodic_template = None if is_yearly else get_template_path(is_yearly=False)
+
+    tasks = []
+    for student_id, data in level_data.items():
+        if is_yearly:
+            template_path, data = get_yearly_card(data, statuses.get(student_id))
+        else:
+            template_path = periodic_template
+        if not os.path.exists(template_path):
+            logger.error(f"Template not found: {template_path}")
+            continue
+        tasks.append(CardTask(student_id, template_path, data, card_cache_key(template_path, data)))
+    return tasks
+
+
+def ensure_cards_cached(tasks, max_workers=None):
+    """Render the cards that have no cached blob yet. Returns the failures as (student_id, error)."""
+    missing = [task for task in tasks if not get_cached_pdf(task.cache_key)]
+    if not missing:
+        return []
+    rendered, failures = render_cards(missing, max_workers=max_workers)
+    keys = {task.student_id: task.cache_key for task in missing}
+    for student_id, pdf in rendered:
+        store_pdf(keys[student_id], pdf)
+    return failures
+
+
+def stream_report_cards_zip(academic_year_id, level_id=None, is_yearly=False):
+    """Yield a ZIP archive of every student's report card, one level folder each.
+
+    Covers one level, or every level with enrollments in the academic year.
+    Cached cards are streamed straight from their blobs; missing ones are
+    rendered a level at a time. Only the entry being written is held in memory.
+    """
+    if level_id:
+        level_ids = [level_id]
+    else:
+        level_ids = list(Enrollment.objects.filter(
+            academic_year_id=academic_year_id
+        ).values_list('level_id', flat=True).distinct().order_by('level_id'))
+
+    buffer = _StreamBuffer()
+    failed = []
+    # PDFs are already compressed, so store them as-is.
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for current_level_id in level_ids:
+            tasks = get_level_card_tasks(current_level_id, academic_year_id, is_yearly=is_yearly)
+            failures = ensure_cards_cached(tasks)
+            failed.extend(failures)
+            failed_ids = {student_id for student_id, _ in failures}
+            for task in tasks:
+                if task.student_id in failed_ids:
+                    continue
+                folder = _safe_name(f"Level_{task.data.get('level', current_level_id)}")
+                filename = _safe_name(f"{task.data.get('name', 'student')}_{task.student_id}") + '.pdf'
+                try:
+                    archive.write(blob_path(task.cache_key), f"{folder}/{filename}")
+                except FileNotFoundError:
+                    # Evicted since ensure_cards_cached; render it again
+                    rendered, failures = render_cards([task])
+                    if failures:
+                        failed.extend(failures)
+                        continue
+                    store_pdf(task.cache_key, rendered[0][1])
+                    archive.writestr(f"{folder}/{filename}", rendered[0][1])
+                yield buffer.drain()
+            logger.info(f"Added {len(tasks) - len(failed_ids)} report cards for level_id={current_level_id} to ZIP")
+
+        if failed:
+            archive.writestr('errors.txt', '\n'.join(f"student_id={student_id}: {error}" for student_id, error in failed))
+    yield buffer.drain()
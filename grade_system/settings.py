@@ -113,6 +113,43 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100
 }
 
+# DOCX -> PDF conversion. 'libreoffice' keeps a pool of warm headless LibreOffice
+# instances (requires the unoserver package); 'docx2pdf' uses Word on Windows hosts.
+PDF_CONVERSION_BACKEND = 'libreoffice'
+PDF_CONVERSION_POOL_SIZE = 2
+PDF_CONVERSION_TIMEOUT = 60  # seconds per document
+PDF_RENDER_WORKERS = None  # threads used to fill level report cards; None = CPU count
+PDF_OPTIMIZE_MERGED = True  # share identical fonts/images across cards in merged level PDFs
+UNOSERVER_COMMAND = 'unoserver'
+UNOCONVERT_COMMAND = 'unoconvert'
+
+# 'docx' fills the DOCX templates and converts them with PDF_CONVERSION_BACKEND;
+# 'direct' draws report cards straight to PDF in Python (no LibreOffice, much faster,
+# layout approximates the templates).
+REPORT_CARD_RENDERER = 'docx'
+
+# Only one process renders a given PDF at a time; others wait for it, then
+# answer "rendering in progress" after PDF_RENDER_LOCK_WAIT seconds.
+PDF_RENDER_LOCK_TTL = 900  # seconds before an abandoned lock expires
+PDF_RENDER_LOCK_WAIT = 30
+# Render workers refresh a running job's heartbeat every PDF_RENDER_JOB_HEARTBEAT
+# seconds; a RUNNING job silent for PDF_RENDER_JOB_STALE_AFTER seconds is requeued.
+PDF_RENDER_JOB_HEARTBEAT = 30
+PDF_RENDER_JOB_STALE_AFTER = 120
+
+# Who sends PDF bytes to the client: 'django' streams them from the app;
+# 'x-accel' (nginx) or 'x-sendfile' (Apache) hand the file to the front server.
+# For x-accel, map PDF_ACCEL_REDIRECT_PREFIX to MEDIA_ROOT as an internal location.
+PDF_DELIVERY_MODE = 'django'
+PDF_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Generated PDFs are content-addressed blobs in PDF_STORAGE_BACKEND ('filesystem' or a
+# dotted class path). collect_pdf_garbage (also run by idle PDF workers) trims cached
+# blobs no record uses once the store exceeds PDF_STORAGE_MAX_BYTES.
+PDF_STORAGE_BACKEND = 'filesystem'
+PDF_STORAGE_MAX_BYTES = 2 * 1024 ** 3
+PDF_STORAGE_GRACE_SECONDS = 3600  # files younger than this are never collected
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -13,6 +13,7 @@ from subjects.views import SubjectViewSet
 from periods.views import PeriodViewSet
 from academic_years.views import AcademicYearViewSet
 from pass_and_failed.views import PassFailedStatusViewSet
+from school_configs.views import LevelConfigViewSet
 from rest_framework_simplejwt.views import TokenObtainPairView 
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -29,6 +30,7 @@ router.register(r'levels', LevelViewSet, basename='level')
 router.register(r'periods', PeriodViewSet, basename='period')
 router.register(r'academic_years', AcademicYearViewSet, basename='academic_year')
 router.register(r'pass_failed_statuses', PassFailedStatusViewSet, basename='pass_failed_status')
+router.register(r'level_configs', LevelConfigViewSet, basename='level_config')
 
 urlpatterns = [
     path('api/', include(router.urls)),  # DRF routes for /api/grade_sheets/
@@ -1,5 +1,8 @@
 import logging
+from django.db import transaction
 from .models import Grade
+from enrollment.models import Enrollment
+from enrollment.versioning import bump_enrollment_versions
 from subjects.models import Subject
 from periods.models import Period
 
@@ -30,6 +33,87 @@ def save_grade(enrollment, subject_id, period_id, score, request):
         logger.error(f"Error saving grade: {str(e)}")
         return None, f"Failed to save grade: {str(e)}"
 
+def bulk_save_grades(level_id, academic_year_id, subject_id, entries):
+    """Validate a batch of scores and upsert them in one transaction.
+
+    ``entries`` is a list of dicts with student_id, score and period_id. Enrollments,
+    the subject and the periods are each resolved with one query, and all grades are
+    written with a single conflict-aware bulk insert on (enrollment, subject, period).
+
+    Returns (saved, skipped_students, errors) where ``saved`` is a list of
+    (student_id, grade) pairs in submission order.
+    """
+    skipped_students = []
+    errors = []
+    valid = []
+
+    for entry in entries:
+        student_id = entry.get('student_id')
+        score = entry.get('score')
+        period_id = entry.get('period_id')
+        if not student_id or score is None or not period_id:
+            errors.append({"student_id": student_id, "error": "Missing student_id, score, or period_id"})
+            continue
+        try:
+            score = int(score)
+        except (ValueError, TypeError):
+            errors.append({"student_id": student_id, "error": "Score must be an integer"})
+            continue
+        if not (0 <= score <= 100):
+            errors.append({"student_id": student_id, "error": "Score must be an integer between 0 and 100"})
+            continue
+        try:
+            valid.append((student_id, int(student_id), int(period_id), score))
+        except (ValueError, TypeError):
+            skipped_students.append(student_id)
+
+    if not valid:
+        return [], skipped_students, errors
+
+    enrollments = {
+        e.student_id: e
+        for e in Enrollment.objects.filter(
+            level_id=level_id,
+            academic_year_id=academic_year_id,
+            student_id__in={student_key for _, student_key, _, _ in valid},
+        )
+    }
+    subject_exists = Subject.objects.filter(id=subject_id).exists()
+    period_ids = set(Period.objects.filter(id__in={p for _, _, p, _ in valid}).values_list('id', flat=True))
+
+    pending = {}
+    for student_id, student_key, period_id, score in valid:
+        enrollment = enrollments.get(student_key)
+        if not enrollment:
+            logger.warning(f"No enrollment found for student_id={student_id}, level_id={level_id}, academic_year_id={academic_year_id}")
+            skipped_students.append(student_id)
+            continue
+        if not subject_exists:
+            errors.append({"student_id": student_id, "error": f"Subject ID {subject_id} does not exist."})
+            continue
+        if period_id not in period_ids:
+            errors.append({"student_id": student_id, "error": f"Period ID {period_id} does not exist."})
+            continue
+        # Later submissions for the same cell win, as with sequential saves.
+        pending[(enrollment.id, period_id)] = (student_id, Grade(
+            enrollment=enrollment, subject_id=subject_id, period_id=period_id, score=score
+        ))
+
+    if not pending:
+        return [], skipped_students, errors
+
+    with transaction.atomic():
+        Grade.objects.bulk_create(
+            [grade for _, grade in pending.values()],
+            update_conflicts=True,
+            unique_fields=['enrollment', 'subject', 'period'],
+            update_fields=['score', 'updated_at'],
+        )
+        # bulk_create sends no post_save signals, so bump the change counters here
+        bump_enrollment_versions(enrollment_id for enrollment_id, _ in pending)
+    logger.info(f"Upserted {len(pending)} grades for level_id={level_id}, subject_id={subject_id}, academic_year_id={academic_year_id}")
+    return list(pending.values()), skipped_students, errors
+
 def get_grade_map(enrollment_ids, subject_id, period_id):
     """Fetch grades for given enrollments, subject, and period."""
     grades = Grade.objects.filter(
@@ -37,4 +121,22 @@ def get_grade_map(enrollment_ids, subject_id, period_id):
         subject_id=subject_id,
         period_id=period_id
     ).select_related('enrollment__student')
-    return {grade.enrollment.student.id: grade.score for grade in grades}
\ No newline at end of file
+    return {grade.enrollment.student.id: grade.score for grade in grades}
+
+def get_grade_pivot(level_id, academic_year_id=None, student_id=None):
+    """Fetch every grade for a level (and optional year/student) in one query.
+
+    Returns a student_id -> subject_id -> period key -> score matrix, e.g.
+    {12: {3: {'1st': 78, '2nd': 81}}}.
+    """
+    grades = Grade.objects.filter(enrollment__level_id=level_id)
+    if academic_year_id:
+        grades = grades.filter(enrollment__academic_year_id=academic_year_id)
+    if student_id:
+        grades = grades.filter(enrollment__student_id=student_id)
+
+    pivot = {}
+    rows = grades.values_list('enrollment__student_id', 'subject_id', 'period__period', 'score')
+    for row_student_id, subject_id, period_key, score in rows:
+        pivot.setdefault(row_student_id, {}).setdefault(subject_id, {})[period_key] = score
+    return pivot
@@ -0,0 +1,66 @@
+import logging
+from django.db.models import Count, Exists, OuterRef
+from enrollment.models import Enrollment
+from enrollment.versioning import bump_enrollment_versions
+from subjects.models import Subject
+from .models import PassFailedStatus
+
+logger = logging.getLogger(__name__)
+
+# Grades a subject needs before a new status is PENDING rather than INCOMPLETE
+GRADES_PER_SUBJECT = 8
+
+
+def backfill_missing_statuses(level_id=None, academic_year_id=None, enrollment_ids=None):
+    """Create a PassFailedStatus for every enrollment that has none.
+
+    The missing rows are found with one anti-join (with each enrollment's grade
+    count) and created with one bulk insert. A new status is INCOMPLETE until
+    every subject of the level has GRADES_PER_SUBJECT grades, then PENDING.
+    Returns the number of statuses attempted: rows a concurrent writer (e.g.
+    the enrollment signal) inserted first are skipped but still counted.
+    """
+    enrollments = Enrollment.objects.all()
+    if level_id:
+        enrollments = enrollments.filter(level_id=level_id)
+    if academic_year_id:
+        enrollments = enrollments.filter(academic_year_id=academic_year_id)
+    if enrollment_ids is not None:
+        enrollments = enrollments.filter(id__in=enrollment_ids)
+
+    has_status = PassFailedStatus.objects.filter(
+        student_id=OuterRef('student_id'),
+        level_id=OuterRef('level_id'),
+        academic_year_id=OuterRef('academic_year_id'),
+    )
+    missing = list(
+        enrollments.filter(~Exists(has_status))
+        .annotate(grade_count=Count('grade'))
+        .values('id', 'student_id', 'level_id', 'academic_year_id', 'grade_count')
+    )
+    if not missing:
+        return 0
+
+    subject_counts = dict(
+        Subject.objects.filter(level_id__in={row['level_id'] for row in missing})
+        .values('level_id').annotate(count=Count('id')).values_list('level_id', 'count')
+    )
+    statuses = []
+    for row in missing:
+        expected_grades = subject_counts.get(row['level_id'], 0) * GRADES_PER_SUBJECT or 1
+        status_value = 'INCOMPLETE' if row['grade_count'] < expected_grades else 'PENDING'
+        statuses.append(PassFailedStatus(
+            student_id=row['student_id'],
+            level_id=row['level_id'],
+            academic_year_id=row['academic_year_id'],
+            enrollment_id=row['id'],
+            grades_complete=row['grade_count'] > 0,
+            status=status_value,
+            template_name=PassFailedStatus.TEMPLATE_NAMES.get(status_value, ''),
+        ))
+    # A concurrent writer may have created some of them meanwhile
+    PassFailedStatus.objects.bulk_create(statuses, ignore_conflicts=True)
+    # bulk_create skips the post_save signal that moves the yearly card's version
+    bump_enrollment_versions(row['id'] for row in missing)
+    logger.info(f"Backfilled missing pass/fail statuses: {len(statuses)} attempted")
+    return len(statuses)
@@ -14,47 +14,6 @@ from datetime import date, timedelta
 from evaluations.promotional_logics import promote_student_if_eligible
 
 
-def initialize_missing_statuses(level_id, academic_year_name, logger):
-    try:
-        level = Level.objects.get(id=level_id)
-        academic_year = AcademicYear.objects.get(name=academic_year_name)
-        enrollments = Enrollment.objects.filter(level=level, academic_year=academic_year)
-
-        for enrollment in enrollments:
-            if not PassFailedStatus.objects.filter(
-                student=enrollment.student,
-                level=level,
-                academic_year=academic_year
-            ).exists():
-                grades = Grade.objects.filter(enrollment=enrollment)
-                subject_count = Subject.objects.filter(level=level).count()
-                expected_grades = subject_count * 8 if subject_count else 1
-                grades_complete = grades.exists()
-                status_value = 'INCOMPLETE' if grades.count() < expected_grades else 'PENDING'
-
-                PassFailedStatus.objects.create(
-                    student=enrollment.student,
-                    level=level,
-                    academic_year=academic_year,
-                    enrollment=enrollment,
-                    grades_complete=grades_complete,
-                    status=status_value,
-                    template_name='pass_template.html'
-                )
-                logger.info(f"Created PassFailedStatus for student {enrollment.student.id}, level {level.id}, year {academic_year.name}")
-
-        return PassFailedStatus.objects.filter(
-            student__in=[e.student_id for e in enrollments]
-        )
-
-    except (Level.DoesNotExist, AcademicYear.DoesNotExist) as e:
-        logger.error(f"Error filtering statuses: {str(e)}")
-        return PassFailedStatus.objects.none()
-    except Exception as e:
-        logger.error(f"Unexpected error in initialize_missing_statuses: {str(e)}")
-        return PassFailedStatus.objects.none()
-
-
 def create_pass_failed_status(student, level, academic_year, enrollment, status='PENDING', validated_by=None):
     """Create or update pass/fail/conditional status with manual assignment and promotion."""
     valid_statuses = [choice[0] for choice in PassFailedStatus.STATUS_CHOICES]
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from academic_years.models import AcademicYear
+from pass_and_failed.backfill import backfill_missing_statuses
+
+
+class Command(BaseCommand):
+    help = "Create a pass/fail status for every enrollment that has none."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--level-id', type=int, default=None, help="Only this level.")
+        parser.add_argument('--academic-year', default=None, help="Only this academic year, by name (e.g. 2024/2025).")
+
+    def handle(self, *args, **options):
+        academic_year_id = None
+        if options['academic_year']:
+            try:
+                academic_year_id = AcademicYear.objects.get(name=options['academic_year']).id
+            except AcademicYear.DoesNotExist:
+                raise CommandError(f"Academic year {options['academic_year']} not found")
+        attempted = backfill_missing_statuses(level_id=options['level_id'], academic_year_id=academic_year_id)
+        self.stdout.write(f"Backfilled missing statuses ({attempted} attempted; rows created concurrently are skipped).")
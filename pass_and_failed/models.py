@@ -12,6 +12,12 @@ class PassFailedStatus(models.Model):
         ('INCOMPLETE', 'Incomplete'),
         ('PENDING', 'Pending'),
     )
+    # Yearly card template for each final status; anything else has none
+    TEMPLATE_NAMES = {
+        'PASS': 'yearly_card_pass.docx',
+        'FAIL': 'yearly_card_fail.docx',
+        'CONDITIONAL': 'yearly_card_conditional.docx',
+    }
 
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='pass_failed_statuses')
     level = models.ForeignKey(Level, on_delete=models.CASCADE)
@@ -29,13 +35,14 @@ class PassFailedStatus(models.Model):
     def __str__(self):
         return f"{self.student} - {self.level} - {self.academic_year} - {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so a save can tell whether it changed
+        instance._loaded_status = dict(zip(field_names, values)).get('status')
+        return instance
+
     def save(self, *args, **kwargs):
-        if self.status == 'PASS':
-            self.template_name = 'yearly_card_pass.docx'
-        elif self.status == 'FAIL':
-            self.template_name = 'yearly_card_fail.docx'
-        elif self.status == 'CONDITIONAL':
-            self.template_name = 'yearly_card_conditional.docx'
-        else:
-            self.template_name = ''
+        # bulk_create skips save(); bulk writers set template_name from TEMPLATE_NAMES themselves
+        self.template_name = self.TEMPLATE_NAMES.get(self.status, '')
         super().save(*args, **kwargs)
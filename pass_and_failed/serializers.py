@@ -15,3 +15,21 @@ class PassFailedStatusSerializer(serializers.ModelSerializer):
         model = PassFailedStatus
         fields = ['id', 'student', 'level', 'academic_year', 'enrollment', 'status',
                   'validated_at', 'validated_by', 'template_name', 'grades_complete']
+
+
+class PassFailedStatusFlatSerializer(serializers.ModelSerializer):
+    """One flat row per status for listings; expects student, level and academic_year to be select_related."""
+    student_id = serializers.IntegerField(read_only=True)
+    student_name = serializers.SerializerMethodField()
+    level_id = serializers.IntegerField(read_only=True)
+    level_name = serializers.CharField(source='level.name', read_only=True)
+    academic_year_id = serializers.IntegerField(read_only=True)
+    academic_year = serializers.CharField(source='academic_year.name', read_only=True)
+
+    class Meta:
+        model = PassFailedStatus
+        fields = ['id', 'student_id', 'student_name', 'level_id', 'level_name', 'academic_year_id', 'academic_year',
+                  'status', 'grades_complete', 'validated_by', 'validated_at']
+
+    def get_student_name(self, obj):
+        return f"{obj.student.firstName} {obj.student.lastName}"
@@ -1,16 +1,21 @@
 import logging
 import os
 from django.conf import settings
+from django.db.models import Prefetch
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .serializers import PassFailedStatusSerializer
+from .serializers import PassFailedStatusSerializer, PassFailedStatusFlatSerializer
 from .models import PassFailedStatus
+from enrollment.models import Enrollment
 from academic_years.models import AcademicYear
-from .helper import initialize_missing_statuses
-from evaluations.statues_logics import handle_validate_status
-from grade_sheets.yearly_pdf import generate_yearly_pdf
+from .backfill import backfill_missing_statuses
+from evaluations.statues_logics import handle_validate_status, persist_level_statuses
+from evaluations.promotional_logics import rollover_academic_year
+from grade_sheets.generatePdf import generate_yearly_gradesheet_pdf
+from grade_sheets.locks import RenderInProgress
 from grade_sheets.models import StudentGradeSheetPDF
+from grade_sheets.pdf_cache import get_pdf_filename, get_source_version, record_pdf
 
 logger = logging.getLogger(__name__)
 
@@ -18,14 +23,28 @@ class PassFailedStatusViewSet(viewsets.ModelViewSet):
     queryset = PassFailedStatus.objects.all()
     serializer_class = PassFailedStatusSerializer
 
+    def is_flat(self):
+        return self.action == 'list' and self.request.query_params.get('flat', '').lower() in ('1', 'true', 'yes')
+
+    def get_serializer_class(self):
+        # ?flat=true lists one flat row per status instead of nested student/level/year objects
+        if self.is_flat():
+            return PassFailedStatusFlatSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('student', 'level', 'academic_year')
+        if not self.is_flat():
+            # StudentSerializer reads student.enrollment.first(); an ordered prefetch serves it from memory
+            queryset = queryset.select_related('enrollment').prefetch_related(Prefetch(
+                'student__enrollment',
+                queryset=Enrollment.objects.select_related('level', 'academic_year').order_by('pk'),
+            ))
         level_id = self.request.query_params.get('level_id')
         academic_year = self.request.query_params.get('academic_year')
 
         if level_id and academic_year:
             try:
-                initialize_missing_statuses(level_id, academic_year, logger)
                 academic_year_obj = AcademicYear.objects.get(name=academic_year)
                 queryset = queryset.filter(level_id=level_id, academic_year=academic_year_obj)
             except AcademicYear.DoesNotExist:
@@ -39,6 +58,64 @@ class PassFailedStatusViewSet(viewsets.ModelViewSet):
         logger.debug(f"Validating status for pk={pk}, data={request.data}")
         return handle_validate_status(self, request, pk, logger)
 
+    @action(detail=False, methods=['POST'], url_path='evaluate')
+    def evaluate_statuses(self, request):
+        """POST /api/pass_failed_statuses/evaluate/ - Persist computed statuses (and promotions) for a level."""
+        level_id = request.data.get('level_id')
+        academic_year = request.data.get('academic_year')
+        if not level_id or not academic_year:
+            return Response({"error": "level_id and academic_year are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            academic_year_obj = AcademicYear.objects.get(name=academic_year)
+            counts = persist_level_statuses(level_id, academic_year_obj.id)
+            return Response({"message": "Statuses evaluated", "counts": counts})
+        except AcademicYear.DoesNotExist:
+            logger.error(f"Academic year {academic_year} not found")
+            return Response({"error": f"Invalid academic year: {academic_year}"}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error evaluating statuses for level {level_id}: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['POST'], url_path='backfill')
+    def backfill(self, request):
+        """POST /api/pass_failed_statuses/backfill/ - Create missing statuses, optionally for one level and/or academic year."""
+        level_id = request.data.get('level_id')
+        academic_year = request.data.get('academic_year')
+
+        try:
+            academic_year_id = AcademicYear.objects.get(name=academic_year).id if academic_year else None
+            attempted = backfill_missing_statuses(level_id=level_id, academic_year_id=academic_year_id)
+            return Response({"message": "Missing statuses backfilled", "attempted": attempted})
+        except AcademicYear.DoesNotExist:
+            logger.error(f"Academic year {academic_year} not found")
+            return Response({"error": f"Invalid academic year: {academic_year}"}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error backfilling statuses: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['POST'], url_path='rollover')
+    def rollover(self, request):
+        """POST /api/pass_failed_statuses/rollover/ - Enroll a year's PASS/CONDITIONAL students in their next level.
+
+        Send dry_run=true to get the report without writing anything.
+        """
+        academic_year = request.data.get('academic_year')
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        if not academic_year:
+            return Response({"error": "academic_year is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            academic_year_obj = AcademicYear.objects.get(name=academic_year)
+            report = rollover_academic_year(academic_year_obj.id, dry_run=dry_run)
+            return Response({"message": "Rollover dry run" if dry_run else "Rollover complete", "report": report})
+        except AcademicYear.DoesNotExist:
+            logger.error(f"Academic year {academic_year} not found")
+            return Response({"error": f"Invalid academic year: {academic_year}"}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error rolling over academic year {academic_year}: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     @action(detail=True, methods=['POST'], url_path='print')
     def print_status(self, request, pk=None):
         try:
@@ -46,7 +123,8 @@ class PassFailedStatusViewSet(viewsets.ModelViewSet):
             logger.debug(f"Printing status for pk={pk}, student={status_obj.student.id}, level={status_obj.level.id}")
 
             pass_template = status_obj.status in ['PASS', 'CONDITIONAL']
-            pdf_paths = generate_yearly_pdf(
+            source_version = get_source_version(status_obj.level.id, status_obj.academic_year.id, status_obj.student.id)
+            pdf_paths = generate_yearly_gradesheet_pdf(
                 level_id=status_obj.level.id,
                 student_id=status_obj.student.id,
                 pass_template=pass_template,
@@ -59,18 +137,17 @@ class PassFailedStatusViewSet(viewsets.ModelViewSet):
                 return Response({"error": "No PDF generated"}, status=status.HTTP_404_NOT_FOUND)
 
             pdf_path = pdf_paths[0]
-            pdf_filename = os.path.basename(pdf_path)
-            StudentGradeSheetPDF.objects.update_or_create(
+            pdf_record, _ = record_pdf(
+                StudentGradeSheetPDF, pdf_path,
+                get_pdf_filename(status_obj.level.id, status_obj.academic_year.id, status_obj.student.id, is_yearly=True),
+                is_yearly=True,
+                source_version=source_version,
                 level_id=status_obj.level.id,
                 student_id=status_obj.student.id,
                 academic_year=status_obj.academic_year,
-                defaults={
-                    'pdf_path': pdf_path,
-                    'filename': pdf_filename,
-                }
             )
 
-            view_url = f"{settings.MEDIA_URL}output_gradesheets/{pdf_filename}"
+            view_url = pdf_record.view_url
             logger.info(f"Generated PDF for student {status_obj.student.id}: {pdf_path}")
             return Response({
                 "message": "PDF generated successfully",
@@ -78,6 +155,12 @@ class PassFailedStatusViewSet(viewsets.ModelViewSet):
                 "pdf_path": pdf_path
             })
 
+        except RenderInProgress as e:
+            return Response(
+                {"message": "Rendering in progress, retry shortly", "key": e.key},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': '5'}
+            )
         except Exception as e:
             logger.error(f"Error printing status {pk}: {str(e)}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('levels', '0012_alter_level_options_level_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LevelConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule_type', models.CharField(choices=[('conditional', 'Conditional'), ('no_conditional_one', 'No Conditional 1'), ('no_conditional_two', 'No Conditional 2')], max_length=50)),
+                ('rule_config', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('level', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='config', to='levels.level')),
+            ],
+        ),
+    ]
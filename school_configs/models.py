@@ -1,3 +1,20 @@
 from django.db import models
+from levels.models import Level
 
-# Create your models here.
+class LevelConfig(models.Model):
+    RULE_TYPE_CHOICES = (
+        ('conditional', 'Conditional'),
+        ('no_conditional_one', 'No Conditional 1'),
+        ('no_conditional_two', 'No Conditional 2'),
+    )
+
+    # A level is governed by one rule; levels without a config use their GradePolicy
+    level = models.OneToOneField(Level, on_delete=models.CASCADE, related_name='config')
+    rule_type = models.CharField(max_length=50, choices=RULE_TYPE_CHOICES)
+    # e.g. {"pass_mark": 70, "below_mark": 69}; see school_configs.rules
+    rule_config = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.level} - {self.get_rule_type_display()}"
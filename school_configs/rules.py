@@ -0,0 +1,139 @@
+import logging
+import threading
+from django.db.models import Case, Max, When
+from periods.models import Period
+from .models import LevelConfig
+
+logger = logging.getLogger(__name__)
+
+# Total average (mean of the subject finals) a student needs
+DEFAULT_PASS_MARK = 70
+# A subject final under this counts as a low subject
+DEFAULT_BELOW_MARK = 69
+
+# rule_type -> (low subjects allowed for PASS, low subjects allowed for CONDITIONAL)
+RULE_TYPES = {
+    'conditional': (1, 2),
+    'no_conditional_one': (1, None),
+    'no_conditional_two': (2, None),
+}
+
+PERIOD_KEYS = ['1st', '2nd', '3rd', '1exam', '4th', '5th', '6th', '2exam']
+
+# level_id -> (LevelConfig.updated_at, compiled evaluator)
+_evaluators = {}
+_evaluators_lock = threading.Lock()
+
+
+def validate_rule_config(rule_type, rule_config):
+    """Check a rule_config against its rule_type. Raises ValueError; returns the config."""
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown rule type: {rule_type}. Must be one of {sorted(RULE_TYPES)}")
+    if not isinstance(rule_config, dict):
+        raise ValueError("rule_config must be a JSON object")
+    for key in ('pass_mark', 'below_mark'):
+        value = rule_config.get(key)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 100:
+            raise ValueError(f"{key} must be a number between 0 and 100")
+    return rule_config
+
+
+def compile_rule(rule_type, rule_config):
+    """Build a level's evaluator: finals -> status.
+
+    finals is the list of the level's subject finals in subject order, with
+    None for a subject that is not fully graded. The thresholds are resolved
+    once here, so evaluating a student is a sum and a count.
+    """
+    validate_rule_config(rule_type, rule_config)
+    pass_mark = rule_config.get('pass_mark', DEFAULT_PASS_MARK)
+    below_mark = rule_config.get('below_mark', DEFAULT_BELOW_MARK)
+    max_below_pass, max_below_conditional = RULE_TYPES[rule_type]
+    if max_below_conditional is None:
+        max_below_conditional = max_below_pass
+
+    def evaluate(finals):
+        if not finals or None in finals:
+            return 'INCOMPLETE'
+        # Total average below the pass mark, without dividing
+        if sum(finals) < pass_mark * len(finals):
+            return 'FAIL'
+        below = sum(1 for final in finals if final < below_mark)
+        if below <= max_below_pass:
+            return 'PASS'
+        if below <= max_below_conditional:
+            return 'CONDITIONAL'
+        return 'FAIL'
+
+    return evaluate
+
+
+def evaluate_batch(evaluator, finals_rows):
+    """Apply a compiled evaluator to many students' finals. Returns the statuses in order."""
+    return list(map(evaluator, finals_rows))
+
+
+def get_level_evaluators(level_ids):
+    """Compiled evaluators for the levels in level_ids that have a LevelConfig, in one query.
+
+    A level's evaluator is compiled once and reused until its config's
+    updated_at changes. Levels without a (valid) config are left out.
+    """
+    configs = LevelConfig.objects.filter(level_id__in=level_ids).values_list(
+        'level_id', 'rule_type', 'rule_config', 'updated_at'
+    )
+    evaluators = {}
+    with _evaluators_lock:
+        for level_id, rule_type, rule_config, updated_at in configs:
+            cached = _evaluators.get(level_id)
+            if cached is None or cached[0] != updated_at:
+                try:
+                    cached = (updated_at, compile_rule(rule_type, rule_config))
+                except ValueError as e:
+                    logger.error(f"Invalid rule config for level {level_id}: {str(e)}")
+                    continue
+                _evaluators[level_id] = cached
+                logger.debug(f"Compiled {rule_type} rule for level {level_id}")
+            evaluators[level_id] = cached[1]
+    return evaluators
+
+
+def subject_final(scores):
+    """A subject's yearly average as printed on the report card ('f').
+
+    scores maps period keys to scores; returns None until every period is graded.
+    """
+    return _final([scores.get(key) for key in PERIOD_KEYS])
+
+
+def _final(scores):
+    """subject_final for scores listed in PERIOD_KEYS order."""
+    if None in scores:
+        return None
+    first_1, first_2, first_3, first_exam, second_1, second_2, second_3, second_exam = scores
+    first = ((first_1 + first_2 + first_3) // 3 + first_exam) // 2
+    second = ((second_1 + second_2 + second_3) // 3 + second_exam) // 2
+    return (first + second) // 2
+
+
+def get_subject_finals(grades):
+    """enrollment_id -> subject_id -> final for a Grade queryset.
+
+    The periods are pivoted in SQL, so the query returns one row per
+    enrollment and subject instead of one per grade.
+    """
+    period_ids = {}
+    for period_id, key in Period.objects.values_list('id', 'period'):
+        period_ids.setdefault(key, []).append(period_id)
+    # Matching on period_id keeps the periods table out of the query
+    pivots = [Max(Case(When(period_id__in=period_ids.get(key, []), then='score'))) for key in PERIOD_KEYS]
+    rows = grades.values('enrollment_id', 'subject_id').annotate(
+        **{f'p{index}': pivot for index, pivot in enumerate(pivots)}
+    ).values_list('enrollment_id', 'subject_id', *[f'p{index}' for index in range(len(pivots))]).order_by()
+
+    finals = {}
+    for enrollment_id, subject_id, *scores in rows:
+        finals.setdefault(enrollment_id, {})[subject_id] = _final(scores)
+    return finals
@@ -0,0 +1,18 @@
+from rest_framework import serializers
+from .models import LevelConfig
+from .rules import validate_rule_config
+
+class LevelConfigSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LevelConfig
+        fields = ['id', 'level', 'rule_type', 'rule_config', 'updated_at']
+        read_only_fields = ['id', 'updated_at']
+
+    def validate(self, attrs):
+        rule_type = attrs.get('rule_type', getattr(self.instance, 'rule_type', None))
+        rule_config = attrs.get('rule_config', getattr(self.instance, 'rule_config', None) or {})
+        try:
+            attrs['rule_config'] = validate_rule_config(rule_type, rule_config)
+        except ValueError as e:
+            raise serializers.ValidationError({'rule_config': str(e)})
+        return attrs
@@ -1,3 +1,55 @@
-from django.shortcuts import render
+import logging
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from academic_years.models import AcademicYear
+from evaluations.statues_logics import persist_statuses_bulk
+from .models import LevelConfig
+from .rules import compile_rule, evaluate_batch
+from .serializers import LevelConfigSerializer
 
-# Create your views here.
+logger = logging.getLogger(__name__)
+
+class LevelConfigViewSet(viewsets.ModelViewSet):
+    queryset = LevelConfig.objects.select_related('level').order_by('level__name')
+    serializer_class = LevelConfigSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        level_id = self.request.query_params.get('level_id')
+        if level_id:
+            queryset = queryset.filter(level_id=level_id)
+        return queryset
+
+    @action(detail=True, methods=['POST'], url_path='preview')
+    def preview(self, request, pk=None):
+        """POST /api/level_configs/{id}/preview/ - Statuses the rule gives sample finals, e.g. {"finals": [[80, 72, 65], [55, 90, 70]]}."""
+        config = self.get_object()
+        finals_rows = request.data.get('finals', [])
+        if not isinstance(finals_rows, list) or not all(isinstance(row, list) for row in finals_rows):
+            return Response({"error": "finals must be a list of lists of subject finals"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            evaluator = compile_rule(config.rule_type, config.rule_config)
+            return Response({"statuses": evaluate_batch(evaluator, finals_rows)})
+        except (ValueError, TypeError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['POST'], url_path='reevaluate')
+    def reevaluate(self, request):
+        """POST /api/level_configs/reevaluate/ - Persist statuses for a whole academic year (or one level) after a rule change."""
+        academic_year = request.data.get('academic_year')
+        level_id = request.data.get('level_id')
+        if not academic_year:
+            return Response({"error": "academic_year is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            academic_year_obj = AcademicYear.objects.get(name=academic_year)
+            counts = persist_statuses_bulk(academic_year_obj.id, level_id)
+            return Response({"message": "Statuses re-evaluated", "counts": counts})
+        except AcademicYear.DoesNotExist:
+            logger.error(f"Academic year {academic_year} not found")
+            return Response({"error": f"Invalid academic year: {academic_year}"}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error re-evaluating statuses for {academic_year}: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -4,6 +4,7 @@ from enrollment.models import Enrollment
 from grades.models import Grade
 from academic_years.models import AcademicYear
 from enrollment.helper import get_enrollment_by_student_level
+from enrollment.versioning import bump_student_versions
 from grade_sheets.models import StudentGradeSheetPDF
 
 logger = logging.getLogger(__name__)
@@ -69,11 +70,8 @@ def edit_student(student_id, level_id, academic_year, first_name=None, last_name
 
         if updates:
             Student.objects.filter(id=student_id).update(**updates)
-            StudentGradeSheetPDF.objects.filter(
-                student_id=student_id,
-                level_id=level_id,
-                academic_year=academic_year_obj
-            ).delete()
+            # queryset.update() sends no signals; mark the student's cards as changed
+            bump_student_versions(student_id)
             logger.info(f"Updated student details for student_id={student_id}: {updates}")
             return {
                 "response": {"message": "Student details updated successfully"},